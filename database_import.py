@@ -9,42 +9,475 @@ under the MIT License. Please consult LICENSE for further details.
 
 Copyright (c) 2025 Minh Nguyen & Yifan Qiu
 """
+from __future__ import annotations
+from typing import Any, BinaryIO, Iterator, Optional
 import csv
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import sys
 
-from graph import Graph
-from sentiment import get_sentiment_review_score, build_sentiment_score_dict
+from graph import Graph, estimate_memory
+from sentiment import SentimentMatcher, get_sentiment_review_score, build_sentiment_score_dict
 
+# The number of bytes before a checkpoint's offset which are fingerprinted, to detect whether
+# the file was rewritten rather than appended to
+FINGERPRINT_BYTES = 4096
 
-def load_review_graph(database_file: str, sentiment_file: str) -> Graph:
+# The accepted formats of the review dates, other than ISO format (YYYY-MM-DD)
+DATE_FORMATS = ['%B %d, %Y', '%b %d, %Y', '%m/%d/%Y', '%d/%m/%Y']
+
+
+def load_review_graph(database_file: str, sentiment_file: str,
+                      min_reviewer_degree: int = 1, min_movie_degree: int = 1, k_core: int = 0,
+                      stats: Optional[dict] = None, review_graph: Optional[Graph] = None,
+                      lazy_sentiment: bool = False, checkpoint_file: Optional[str] = None) -> Graph:
     """Return a review graph with the given dataset
 
+    The graph can be pruned while loading:
+        - min_reviewer_degree: reviewers with fewer reviews than this are dropped
+        - min_movie_degree: movies with fewer reviews than this are dropped
+        - k_core: after the degree filters, vertices with fewer than k_core remaining
+          neighbours are repeatedly dropped, until every vertex has at least k_core neighbours
+
+    When pruning, the file is read twice: once to count the reviews of each movie and reviewer,
+    and once to build the graph, so the pruned vertices and edges are never added to the graph
+    (nor is the sentiment of their reviews computed).
+
+    If stats is given, it is updated with the number of vertices and edges that were kept and
+    dropped, and the estimated memory saved by pruning (in bytes). Nothing is dropped (nor saved)
+    when the graph is not pruned.
+
+    If review_graph is given (e.g. a sqlite_graph.SQLiteGraph), the reviews are added to it in a
+    single bulk load, and it is returned instead of a new Graph.
+
+    If lazy_sentiment is True, the sentiment scores are not computed while loading. Only the byte offset
+    of each review is kept, and the graph computes the sentiment scores in batches the first time they
+    are needed (see Graph.set_sentiment_source), so that the unweighted and weighted modes start faster.
+    Raise a ValueError if lazy_sentiment is True and review_graph is given but is not a Graph, since
+    only a Graph can compute sentiment scores lazily.
+
+    If checkpoint_file is given, a checkpoint at the end of the loaded reviews is saved to it (see
+    Checkpoint.save), so that refresh_review_graph only loads the reviews appended after them.
+
     Preconditions:
         - database_file is the path to a CSV file corresponding to the following
         service formatting:
             index, movie title, reviewer, publisher, review, date, score
+        - min_reviewer_degree >= 1
+        - min_movie_degree >= 1
+        - k_core >= 0
+    """
+    review_graph, checkpoint = _load_reviews(database_file, sentiment_file, {
+        'min_reviewer_degree': min_reviewer_degree, 'min_movie_degree': min_movie_degree,
+        'k_core': k_core, 'lazy_sentiment': lazy_sentiment}, stats, review_graph)
+    if checkpoint_file is not None:
+        checkpoint.save(checkpoint_file)
+    return review_graph
+
+
+def _load_reviews(database_file: str, sentiment_file: str, options: dict, stats: Optional[dict],
+                  review_graph: Optional[Graph]) -> tuple[Graph, Checkpoint]:
+    """Return a review graph with the given dataset, loaded with the given options of load_review_graph,
+    and a checkpoint at the end of the loaded reviews, which records the options.
     """
+    min_reviewer_degree, min_movie_degree = options['min_reviewer_degree'], options['min_movie_degree']
+    k_core, lazy_sentiment = options['k_core'], options['lazy_sentiment']
+
     # The review graph to be returned
-    review_graph = Graph()
-    sentiment_dict = build_sentiment_score_dict(sentiment_file)
+    if review_graph is None:
+        review_graph = Graph()
+    elif lazy_sentiment and not isinstance(review_graph, Graph):
+        raise ValueError
+    sentiment_matcher = SentimentMatcher(build_sentiment_score_dict(sentiment_file))
+
+    pruning = min_reviewer_degree > 1 or min_movie_degree > 1 or k_core > 1
+    if pruning:
+        kept_movies, kept_reviewers, totals = _find_kept_vertices(database_file, min_reviewer_degree,
+                                                                  min_movie_degree, k_core)
+    else:
+        kept_movies, kept_reviewers, totals = set(), set(), (0, 0)
 
-    with open(database_file, 'r') as file:
-        reader = csv.reader(file, skipinitialspace=True)
-        next(reader)  # Skip header
+    if lazy_sentiment:
+        review_graph.set_sentiment_source(LazySentiment(database_file, sentiment_matcher))
 
-        for row in reader:
+    # The end of the last review known to be complete
+    offset = 0
+    with open(database_file, 'rb') as file, review_graph.bulk_load():
+        for row, start, end in _read_rows(file, 0, False):
             title, reviewer = row[1:3]
-            review = row[4]
-            score = row[6]
+            if not pruning or (title in kept_movies and reviewer in kept_reviewers):
+                _import_row(review_graph, row, sentiment_matcher, start if lazy_sentiment else None)
+            offset = end
+        if offset > 0:
+            file.seek(offset - 1)
+            if file.read(1) != b'\n':
+                # The last review may still be being written, so the next refresh reads it again
+                offset = start
+        else:
+            file.seek(0)
+            offset = len(file.readline())
 
-            # Import movie title
-            review_graph.add_vertex(title, 'movie')
-            # Import reviewer node
-            review_graph.add_vertex(reviewer, 'user')
-            # Import score (for now)
-            sentiment_score = get_sentiment_review_score(review, sentiment_dict)
-            review_graph.add_edge(title, reviewer, [float(score), sentiment_score])
+    if stats is not None:
+        _record_pruning(review_graph, totals if pruning else None, stats)
 
-    return review_graph
+    return review_graph, create_checkpoint(database_file, offset, options)
+
+
+def _find_kept_vertices(database_file: str, min_reviewer_degree: int, min_movie_degree: int,
+                        k_core: int) -> tuple[set[str], set[str], tuple[int, int]]:
+    """Return the movie titles and reviewers which remain after pruning the reviews in database_file,
+    as described in load_review_graph, and the number of vertices and edges of the unpruned graph.
+
+    Movies and reviewers are numbered while reading, so that only one pair of integers is kept
+    for every review.
+    """
+    movie_ids, reviewer_ids = {}, {}
+    reviews = set()
+
+    with open(database_file, 'rb') as file:
+        for row, _, _ in _read_rows(file, 0, False):
+            movie_id = movie_ids.setdefault(row[1], len(movie_ids))
+            reviewer_id = reviewer_ids.setdefault(row[2], len(reviewer_ids))
+            reviews.add((movie_id, reviewer_id))
+
+    movie_reviewers = [[] for _ in movie_ids]
+    reviewer_movies = [[] for _ in reviewer_ids]
+    for movie_id, reviewer_id in reviews:
+        movie_reviewers[movie_id].append(reviewer_id)
+        reviewer_movies[reviewer_id].append(movie_id)
+
+    # Degree filters
+    movie_degrees = [len(reviewers) for reviewers in movie_reviewers]
+    reviewer_degrees = [len(movies) for movies in reviewer_movies]
+    movie_kept = [degree >= min_movie_degree for degree in movie_degrees]
+    reviewer_kept = [degree >= min_reviewer_degree for degree in reviewer_degrees]
+
+    for movie_id, reviewer_id in reviews:
+        if not movie_kept[movie_id] or not reviewer_kept[reviewer_id]:
+            movie_degrees[movie_id] -= 1
+            reviewer_degrees[reviewer_id] -= 1
+
+    # Iterated k-core: removing a vertex lowers the degree of its neighbours, which may in turn
+    # need to be removed.
+    if k_core > 1:
+        adjacency = {'movie': movie_reviewers, 'user': reviewer_movies}
+        kept = {'movie': movie_kept, 'user': reviewer_kept}
+        degrees = {'movie': movie_degrees, 'user': reviewer_degrees}
+        other_kind = {'movie': 'user', 'user': 'movie'}
+
+        stack = [(kind, i) for kind in kept for i in range(len(kept[kind]))
+                 if kept[kind][i] and degrees[kind][i] < k_core]
+        for kind, i in stack:
+            kept[kind][i] = False
+
+        while stack:
+            kind, i = stack.pop()
+            neighbour_kind = other_kind[kind]
+            for j in adjacency[kind][i]:
+                if kept[neighbour_kind][j]:
+                    degrees[neighbour_kind][j] -= 1
+                    if degrees[neighbour_kind][j] < k_core:
+                        kept[neighbour_kind][j] = False
+                        stack.append((neighbour_kind, j))
+
+    kept_movies = {title for title, movie_id in movie_ids.items() if movie_kept[movie_id]}
+    kept_reviewers = {reviewer for reviewer, reviewer_id in reviewer_ids.items() if reviewer_kept[reviewer_id]}
+    return kept_movies, kept_reviewers, (len(movie_ids) + len(reviewer_ids), len(reviews))
+
+
+def _record_pruning(review_graph: Graph, totals: Optional[tuple[int, int]], stats: dict) -> None:
+    """Record in stats how many vertices and edges of the unpruned graph were kept in and dropped from
+    review_graph, and the estimated memory saved.
+
+    totals is the number of vertices and edges of the unpruned graph, or None if nothing was pruned.
+    """
+    kept_vertices = len(review_graph.get_all_vertices())
+    kept_edges = review_graph.count_edges()
+    if totals is None:
+        totals = (kept_vertices, kept_edges)
+    total_vertices, total_edges = totals
+    bytes_saved = estimate_memory(total_vertices, total_edges) - estimate_memory(kept_vertices, kept_edges)
+
+    stats.update({'vertices_kept': kept_vertices, 'vertices_dropped': total_vertices - kept_vertices,
+                  'edges_kept': kept_edges, 'edges_dropped': total_edges - kept_edges,
+                  'bytes_saved': bytes_saved})
+
+
+class Checkpoint:
+    """A position in a review CSV file, up to which every review has been loaded.
+
+    Instance Attributes:
+        - offset: The byte offset just after the last loaded review.
+        - header_hash: A fingerprint of the header line of the file.
+        - tail_hash: A fingerprint of the (up to) FINGERPRINT_BYTES bytes just before offset.
+        - options: The pruning and lazy_sentiment options of load_review_graph the reviews were
+          loaded with, used again if the file must be reloaded.
+
+    Representation Invariants:
+        - self.offset >= 0
+    """
+    offset: int
+    header_hash: str
+    tail_hash: str
+    options: dict
+
+    def __init__(self, offset: int, header_hash: str, tail_hash: str, options: Optional[dict] = None) -> None:
+        """Initialize a new checkpoint."""
+        self.offset = offset
+        self.header_hash = header_hash
+        self.tail_hash = tail_hash
+        self.options = {} if options is None else options
+
+    def matches(self, database_file: str) -> bool:
+        """Return whether database_file still starts with the rows this checkpoint was created from,
+        i.e. whether the file was only appended to since.
+        """
+        if os.path.getsize(database_file) < self.offset:
+            return False
+        current = create_checkpoint(database_file, self.offset)
+        return current.header_hash == self.header_hash and current.tail_hash == self.tail_hash
+
+    def __eq__(self, other: Any) -> bool:
+        """Return whether this checkpoint is the same as other."""
+        return (isinstance(other, Checkpoint) and self.offset == other.offset
+                and self.header_hash == other.header_hash and self.tail_hash == other.tail_hash
+                and self.options == other.options)
+
+    def save(self, checkpoint_file: str) -> None:
+        """Save this checkpoint as a JSON file."""
+        with open(checkpoint_file, 'w') as file:
+            json.dump({'offset': self.offset, 'header_hash': self.header_hash, 'tail_hash': self.tail_hash,
+                       'options': self.options}, file)
+
+
+def load_checkpoint(checkpoint_file: str) -> Checkpoint:
+    """Return the checkpoint saved in the given JSON file by Checkpoint.save."""
+    with open(checkpoint_file, 'r') as file:
+        data = json.load(file)
+    return Checkpoint(data['offset'], data['header_hash'], data['tail_hash'], data.get('options'))
+
+
+def create_checkpoint(database_file: str, offset: int, options: Optional[dict] = None) -> Checkpoint:
+    """Return a checkpoint of database_file at the given byte offset, recording the given load options.
+
+    Preconditions:
+        - 0 <= offset <= os.path.getsize(database_file)
+    """
+    with open(database_file, 'rb') as file:
+        header_hash = hashlib.sha256(file.readline()).hexdigest()
+        start = max(0, offset - FINGERPRINT_BYTES)
+        file.seek(start)
+        tail_hash = hashlib.sha256(file.read(offset - start)).hexdigest()
+    return Checkpoint(offset, header_hash, tail_hash, options)
+
+
+def refresh_review_graph(review_graph: Graph, database_file: str, sentiment_file: str,
+                         checkpoint: Optional[Checkpoint] = None) -> tuple[Graph, Checkpoint]:
+    """Return the review graph updated with the reviews added to database_file since the given checkpoint,
+    and a new checkpoint at the end of the loaded reviews.
+
+    The new reviews are merged into review_graph, which is returned. If there is no checkpoint, or
+    database_file was rewritten (rather than appended to) since the checkpoint, review_graph is cleared
+    and the whole file is loaded into it instead (as in load_review_graph, with the options recorded in
+    the checkpoint), so that it keeps its backend (e.g. a sqlite_graph.SQLiteGraph).
+
+    A review which is still being written (the last line of the file is incomplete) is left for
+    the next refresh. Appended reviews are never pruned, and their sentiment scores are computed
+    lazily if the checkpoint's reviews were. Raise a ValueError if they are computed lazily but
+    review_graph is not a Graph.
+
+    Preconditions:
+        - database_file has the same format as in load_review_graph
+    """
+    options = {'min_reviewer_degree': 1, 'min_movie_degree': 1, 'k_core': 0, 'lazy_sentiment': False}
+    if checkpoint is not None:
+        options.update(checkpoint.options)
+    if options['lazy_sentiment'] and not isinstance(review_graph, Graph):
+        raise ValueError
+    if checkpoint is None or not checkpoint.matches(database_file):
+        review_graph.clear()
+        return _load_reviews(database_file, sentiment_file, options, None, review_graph)
+
+    offset = checkpoint.offset
+    sentiment_matcher = SentimentMatcher(build_sentiment_score_dict(sentiment_file))
+    if options['lazy_sentiment']:
+        review_graph.set_sentiment_source(LazySentiment(database_file, sentiment_matcher))
+    with open(database_file, 'rb') as file, review_graph.bulk_load():
+        for row, start, end in _read_rows(file, offset, True):
+            _import_row(review_graph, row, sentiment_matcher, start if options['lazy_sentiment'] else None)
+            offset = end
+
+    return review_graph, create_checkpoint(database_file, offset, options)
+
+
+def save_snapshot(review_graph: Graph, checkpoint: Checkpoint, snapshot_file: str) -> None:
+    """Save the given review graph and its checkpoint to snapshot_file, so that a later
+    refresh_review_graph can continue from them after a restart.
+    """
+    with open(snapshot_file, 'wb') as file:
+        pickle.dump((review_graph, checkpoint), file, pickle.HIGHEST_PROTOCOL)
+
+
+def load_snapshot(snapshot_file: str) -> tuple[Graph, Checkpoint]:
+    """Return the review graph and checkpoint saved in snapshot_file by save_snapshot."""
+    with open(snapshot_file, 'rb') as file:
+        return pickle.load(file)
+
+
+def _import_row(review_graph: Graph, row: list[str], sentiment_matcher: SentimentMatcher,
+                review_offset: Optional[int] = None) -> None:
+    """Add the review in the given CSV row to review_graph.
+
+    If review_offset (the byte offset of the row) is given, the sentiment score is left to be computed
+    later, by a LazySentiment.
+    """
+    title, reviewer = row[1:3]
+    # Publishers are shared by many reviews, so only one copy of each is kept
+    publisher = sys.intern(row[3])
+    review = row[4]
+    date = row[5]
+    score = row[6]
+
+    # Import movie title
+    review_graph.add_vertex(title, 'movie')
+    # Import reviewer node
+    review_graph.add_vertex(reviewer, 'user')
+    # Import score, sentiment, date and publisher
+    if review_offset is None:
+        sentiment_score = get_sentiment_review_score(review, sentiment_matcher)
+        review_graph.add_edge(title, reviewer, [float(score), sentiment_score, parse_date(date), publisher])
+    else:
+        review_graph.add_edge(title, reviewer, [float(score), None, parse_date(date), publisher, review_offset])
+
+
+class LazySentiment:
+    """Computes the sentiment scores of reviews loaded without them, by reading the reviews again
+    from the database file.
+
+    The review offsets stored in the edge weights are only valid as long as the database file is only
+    appended to, so the file is checked against a checkpoint of it taken when this source was created.
+
+    Instance Attributes:
+        - database_file: The path of the CSV file the reviews were loaded from.
+        - sentiment_matcher: The sentiment lexicon used to score the reviews.
+        - checkpoint: A checkpoint at the end of database_file when this source was created.
+    """
+    database_file: str
+    sentiment_matcher: SentimentMatcher
+    checkpoint: Checkpoint
+
+    def __init__(self, database_file: str, sentiment_matcher: SentimentMatcher) -> None:
+        """Initialize a new lazy sentiment source for the reviews currently in database_file."""
+        self.database_file = database_file
+        self.sentiment_matcher = sentiment_matcher
+        self.checkpoint = create_checkpoint(database_file, os.path.getsize(database_file))
+
+    def resolve(self, weights: list[list]) -> None:
+        """Set the sentiment score of each of the given edge weights, which end with the byte offset
+        of their review in the database file.
+
+        The reviews are read in order of their offset, so that the file is read front to back, and
+        consecutive reviews are read without seeking.
+
+        Raise a ValueError if database_file was rewritten (rather than appended to) since this source
+        was created, as the offsets may then point into different reviews.
+        """
+        if not os.path.exists(self.database_file) or not self.checkpoint.matches(self.database_file):
+            raise ValueError(f'{self.database_file} was changed since its reviews were loaded, so their '
+                             f'sentiment scores cannot be computed; reload the review graph')
+
+        weights = sorted(weights, key=lambda weight: weight[4])
+        with open(self.database_file, 'rb') as file:
+            rows, position = None, -1
+            for weight in weights:
+                if weight[4] != position:
+                    rows = _read_rows(file, weight[4], False)
+                row, _, position = next(rows)
+                weight[1] = get_sentiment_review_score(row[4], self.sentiment_matcher)
+
+
+def parse_date(date: str) -> int:
+    """Return the given review date as an ordinal (see datetime.date.toordinal), or 0 if it cannot be parsed.
+
+    >>> parse_date('2020-05-17') == datetime.date(2020, 5, 17).toordinal()
+    True
+    >>> parse_date('May 17, 2020') == datetime.date(2020, 5, 17).toordinal()
+    True
+    >>> parse_date('')
+    0
+    """
+    date = date.strip()
+    try:
+        return datetime.date.fromisoformat(date[:10]).toordinal()
+    except ValueError:
+        pass
+
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(date, date_format).date().toordinal()
+        except ValueError:
+            continue
+    return 0
+
+
+class _LineReader:
+    """An iterator over the decoded lines of a binary file, which keeps track of its byte offset.
+
+    Instance Attributes:
+        - offset: The byte offset just after the last line returned.
+        - complete_only: Whether to stop before a last line that has no line break (yet).
+        - exhausted: Whether the end of the file (or of the complete lines) was reached.
+    """
+    offset: int
+    complete_only: bool
+    exhausted: bool
+    _file: BinaryIO
+
+    def __init__(self, file: BinaryIO, offset: int, complete_only: bool) -> None:
+        """Initialize a line reader starting at the given offset of file."""
+        file.seek(offset)
+        self._file = file
+        self.offset = offset
+        self.complete_only = complete_only
+        self.exhausted = False
+
+    def __iter__(self) -> _LineReader:
+        """Return this iterator."""
+        return self
+
+    def __next__(self) -> str:
+        """Return the next line of the file."""
+        line = self._file.readline()
+        if line == b'' or (self.complete_only and not line.endswith(b'\n')):
+            self.exhausted = True
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode('utf-8')
+
+
+def _read_rows(file: BinaryIO, offset: int, complete_only: bool) -> Iterator[tuple[list[str], int, int]]:
+    """Yield every review row of the given CSV file starting at the given byte offset, along with the
+    byte offsets of the start of the row and just after the row. The header row is skipped if offset is 0.
+
+    If complete_only is True, a last row that is still being written (its last line has no
+    line break yet) is not yielded.
+    """
+    lines = _LineReader(file, offset, complete_only)
+    reader = csv.reader(lines, skipinitialspace=True)
+    if offset == 0:
+        next(reader, None)  # Skip header
+
+    start = lines.offset
+    for row in reader:
+        if complete_only and lines.exhausted:
+            # The file ended in the middle of a quoted field
+            return
+        if len(row) >= 7:
+            yield row, start, lines.offset
+        start = lines.offset
 
 
 if __name__ == "__main__":
@@ -53,7 +486,10 @@ if __name__ == "__main__":
 
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['graph', 'csv', 'sentiment'],
-        'allowed-io': ['load_review_graph'],
+        'extra-imports': ['graph', 'csv', 'datetime', 'hashlib', 'json', 'os', 'pickle', 'sys', 'sentiment'],
+        'allowed-io': ['_load_reviews', '_find_kept_vertices', 'Checkpoint.save',
+                       'LazySentiment.resolve',
+                       'load_checkpoint', 'create_checkpoint', 'refresh_review_graph', 'save_snapshot',
+                       'load_snapshot'],
         'max-line-length': 120
     })
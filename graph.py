@@ -10,36 +10,79 @@ under the MIT License. Please consult LICENSE for further details.
 Copyright (c) 2025 Minh Nguyen & Yifan Qiu
 """
 from __future__ import annotations
-from typing import Any, Union
+from array import array
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional, Union
+import bisect
+import datetime
+import heapq
+import itertools
+import math
+import re
+import sys
+import time
 
 import networkx as nx
 
 
 MAX_VERTICES = 5000
 
+# The number of edges visited by Graph.recommend_movie_anytime between checks of its deadline
+DEADLINE_CHECK_EDGES = 256
+
+# The number of Graph.recommend_movie_anytime scans kept by a Graph, so that the next call for the
+# same movie resumes (or reuses) its scan
+MAX_CACHED_SCANS = 8
+
+# The initial estimate of the time (in seconds) per candidate movie for Graph.recommend_movie_anytime to
+# find the recommendations of a scan, before it is first measured
+FINISH_COST_ESTIMATE = 2e-6
+
+# The total size of the restriction sweeps kept in memory by a Graph, in 8-byte values
+# (see RestrictionSweep.size)
+MAX_CACHED_SWEEP_SIZE = 8_000_000
+
 
 class _Vertex:
     """A vertex in a graph.
 
+    Each edge weight is a list of [score, sentiment score, review date, publisher], where the review
+    date is a proleptic Gregorian ordinal (see datetime.date.toordinal), or 0 if the date is unknown,
+    and the publisher is '' if unknown. When the sentiment score is computed lazily (see
+    Graph.set_sentiment_source), it is None until computed, and the list is followed by the
+    location of the review.
+
     Instance Attributes:
         - item: The data stored in this vertex, representing a user or movie.
         - kind: The type of this vertex: 'user' or 'movie'.
+        - index: The number of this vertex among the vertices of the same kind in its graph.
         - neighbours: The vertices that are adjacent to this vertex.
+        - date_index: The review dates of the edges of this vertex in increasing order, with the neighbours
+          in the same order, or None if it must be rebuilt. It is only built for windowed queries.
+        - bitmap: The indices of the neighbours of this vertex, as a bitset, as of the last time its graph
+          built its bitmaps (see Graph._ensure_bitmaps).
 
     Representation Invariants:
         - self not in self.neighbours
         - kind in ['user', 'movie']
         - all(self in u.neighbours for u in self.neighbours)
+        - self.date_index is None or len(self.date_index[0]) == len(self.date_index[1]) == len(self.neighbours)
     """
     item: Any
     kind: str
+    index: int
     neighbours: dict[_Vertex, list[float]]
+    date_index: Optional[tuple[list[int], list[_Vertex]]]
+    bitmap: int
 
-    def __init__(self, item: Any, kind: str, neighbours: dict[_Vertex, list[float]]) -> None:
+    def __init__(self, item: Any, kind: str, neighbours: dict[_Vertex, list[float]], index: int = 0) -> None:
         """Initialize a new vertex with the given item and neighbours."""
         self.item = item
         self.kind = kind
+        self.index = index
         self.neighbours = neighbours
+        self.date_index = None
+        self.bitmap = _to_bitmap(u.index for u in neighbours)
 
     def degree(self) -> int:
         """Return the degree of this vertex."""
@@ -58,11 +101,83 @@ class _Vertex:
             advanced_weight = score + (score * sentiment_score)
         """
         if other in self.neighbours:
-            score, sentiment_score = self.neighbours[other]
+            score, sentiment_score = self.neighbours[other][:2]
             return round(score + (score * sentiment_score), 1)
         else:
             return 0
 
+    def window_weights(self, start: int, end: int, reference: int, half_life: float) -> dict[_Vertex, float]:
+        """Return a dictionary mapping each neighbour whose review date is between start and end (inclusive)
+        to the time decay weight of its edge.
+
+        The time decay weight halves every half_life days before the reference date. If half_life is 0,
+        every weight is 1. Only the edges within the window are visited (see _date_bounds).
+
+        Preconditions:
+            - 0 < start <= end
+            - half_life >= 0
+        """
+        first, last = self._date_bounds(start, end)
+        dates, neighbours = self.date_index
+        if half_life <= 0:
+            return dict.fromkeys(neighbours[first:last], 1.0)
+        return {neighbours[i]: time_decay(dates[i], reference, half_life) for i in range(first, last)}
+
+    def window_total(self, start: int, end: int, reference: int, half_life: float) -> float:
+        """Return the sum of the time decay weights of the edges whose review date is between start and
+        end (inclusive), as in window_weights.
+
+        Without time decay, the edges are counted without visiting them.
+
+        Preconditions:
+            - 0 < start <= end
+            - half_life >= 0
+        """
+        if half_life > 0:
+            return sum(self.window_weights(start, end, reference, half_life).values())
+
+        first, last = self._date_bounds(start, end)
+        return last - first
+
+    def _date_bounds(self, start: int, end: int) -> tuple[int, int]:
+        """Return the positions in self.date_index of the first edge reviewed on or after start, and of the
+        first edge reviewed after end, building self.date_index if needed.
+        """
+        if self.date_index is None:
+            edges = sorted(self.neighbours.items(), key=lambda edge: edge[1][2])
+            self.date_index = ([weight[2] for _, weight in edges], [u for u, _ in edges])
+        dates = self.date_index[0]
+        return bisect.bisect_left(dates, start), bisect.bisect_right(dates, end)
+
+    def similarity_score_windowed(self, other: _Vertex, score_type: str, restriction: int,
+                                  window: tuple[int, int, int, float]) -> float:
+        """Return the similarity score between this vertex and other, using only the edges whose review
+        date is in the given window, each counted with its time decay weight.
+
+        window is a tuple of (start, end, reference, half_life), as in window_weights. A shared neighbour
+        counts with the smaller of its two edges' weights. With every weight equal to 1, this is the same
+        as the unwindowed similarity score of the given score_type.
+
+        Preconditions:
+            - score_type in {'unweighted', 'weighted', 'advanced_weighted'}
+            - restriction >= 0
+        """
+        ours = self.window_weights(*window)
+        theirs = other.window_weights(*window)
+
+        shared, shared_restrict = 0, 0
+        for vertex, our_weight in ours.items():
+            if vertex in theirs:
+                weight = min(our_weight, theirs[vertex])
+                shared += weight
+                if _within_restriction(self, other, vertex, score_type, restriction):
+                    shared_restrict += weight
+
+        union = sum(ours.values()) + sum(theirs.values()) - shared
+        if union <= 0:
+            return 0
+        return shared_restrict / union
+
     def similarity_score_unweighted(self, other: _Vertex) -> float:
         """Return the unweighted similarity score between this vertex and other."""
         if self.degree() == 0 or other.degree() == 0:
@@ -109,6 +224,433 @@ class _Vertex:
             return len(intersect_restrict) / len(union)
 
 
+def time_decay(date: int, reference: int, half_life: float) -> float:
+    """Return the time decay weight of a review on the given date, which halves every half_life days
+    before the reference date. Return 1 if half_life is 0.
+
+    >>> time_decay(100, 130, 30)
+    0.5
+    >>> time_decay(100, 130, 0)
+    1.0
+    """
+    if half_life <= 0:
+        return 1.0
+    return 0.5 ** (max(reference - date, 0) / half_life)
+
+
+def _within_restriction(v1: _Vertex, v2: _Vertex, vertex: _Vertex, score_type: str, restriction: float) -> bool:
+    """Return whether the edges from v1 and v2 to their shared neighbour vertex have weights within
+    restriction of each other, for the given score type. Always return True for 'unweighted'.
+    """
+    if score_type == 'unweighted':
+        return True
+    elif score_type == 'weighted':
+        return abs(v1.weight(vertex) - v2.weight(vertex)) <= restriction
+    else:
+        return abs(v1.advanced_weight(vertex) - v2.advanced_weight(vertex)) <= restriction
+
+
+class RestrictionSweep:
+    """The weighted (or advanced weighted) similarity scores between one movie and every other movie,
+    for any restriction.
+
+    For every movie sharing a reviewer with the given movie, the absolute differences between the
+    two movies' scores from each shared reviewer are stored in sorted order. The number of shared
+    reviewers within a restriction is then a binary search, and the scores for a sorted list of
+    restrictions are found in one pass over the differences.
+
+    Instance Attributes:
+        - movie: The movie that the other movies are compared to.
+        - advanced: Whether the differences are between advanced weights.
+        - size: The number of values stored by this sweep (each taking 8 bytes).
+
+    Representation Invariants:
+        - self._items == sorted(self._items)
+        - len(self._starts) == len(self._items) + 1 and len(self._unions) == len(self._items)
+        - all(list(self._differences[self._starts[i]:self._starts[i + 1]])
+              == sorted(self._differences[self._starts[i]:self._starts[i + 1]]) for i in range(len(self._items)))
+        - self.size == len(self._differences) + 4 * len(self._items)
+    """
+    # Private Instance Attributes:
+    #     - _items:
+    #         The movies sharing a reviewer with self.movie, in sorted order.
+    #     - _starts:
+    #         The start of each movie's differences in _differences, followed by the end of the last.
+    #     - _differences:
+    #         The sorted score differences of each movie in _items, one after another. The differences
+    #         are stored in flat arrays, rather than one list per movie, to keep cached sweeps small.
+    #     - _unions:
+    #         The number of reviewers of either movie, for each movie in _items.
+    #     - _by_shared:
+    #         The positions in _items, in order of decreasing number of differences.
+    #     - _degree:
+    #         The number of reviewers of self.movie.
+    movie: Any
+    advanced: bool
+    size: int
+    _items: list[Any]
+    _starts: array
+    _differences: array
+    _unions: array
+    _by_shared: array
+    _degree: int
+
+    def __init__(self, vertex: _Vertex, advanced: bool,
+                 candidates: Optional[dict[_Vertex, list[float]]] = None) -> None:
+        """Initialize the sweep of the given movie vertex, with one pass over its two-hop neighbourhood.
+
+        If candidates is given, it maps each movie sharing a reviewer with the given movie to the
+        (unsorted) score differences, as computed by two_hop_differences, and is used instead.
+        """
+        self.movie = vertex.item
+        self.advanced = advanced
+
+        if candidates is None:
+            candidates = {}
+            for reviewer in vertex.neighbours:
+                if advanced:
+                    our_weight = vertex.advanced_weight(reviewer)
+                else:
+                    our_weight = vertex.weight(reviewer)
+                for other in reviewer.neighbours:
+                    if other is not vertex:
+                        if advanced:
+                            their_weight = other.advanced_weight(reviewer)
+                        else:
+                            their_weight = other.weight(reviewer)
+                        candidates.setdefault(other, []).append(abs(our_weight - their_weight))
+
+        others = sorted(candidates, key=lambda v: v.item)
+        self._items = [other.item for other in others]
+        self._starts = array('q', [0])
+        self._differences = array('d')
+        self._unions = array('q')
+        for other in others:
+            differences = candidates[other]
+            self._differences.extend(sorted(differences))
+            self._starts.append(len(self._differences))
+            self._unions.append(vertex.degree() + other.degree() - len(differences))
+        self._by_shared = array('q', sorted(range(len(others)), key=lambda i: len(candidates[others[i]]),
+                                            reverse=True))
+        self._degree = vertex.degree()
+        self.size = len(self._differences) + 4 * len(self._items)
+
+    def similarity_score(self, other: Any, restriction: float) -> float:
+        """Return the similarity score between self.movie and other for the given restriction."""
+        i = bisect.bisect_left(self._items, other)
+        if i == len(self._items) or self._items[i] != other:
+            return 0
+        return self._count(i, restriction) / self._unions[i]
+
+    def _count(self, i: int, restriction: float) -> int:
+        """Return the number of differences of the i-th movie in _items which are at most restriction."""
+        start = self._starts[i]
+        return bisect.bisect_right(self._differences, restriction, start, self._starts[i + 1]) - start
+
+    def recommend(self, limit: int, restriction: float) -> list[tuple[float, str, str]]:
+        """Return the recommendations of Graph.recommend_movie for self.movie and the given restriction.
+
+        A movie's score is at most its number of differences divided by the degree of self.movie, so the
+        movies are visited in order of decreasing number of differences, and the search stops once that
+        bound is below the score of the <limit>-th best movie found so far.
+
+        Preconditions:
+            - limit >= 1
+        """
+        # A min-heap of the <limit> best ratings found so far
+        best = []
+        for i in self._by_shared:
+            bound = round((self._starts[i + 1] - self._starts[i]) / self._degree * 1000, 2)
+            if len(best) == limit and bound < best[0][0]:
+                break
+            shared = self._count(i, restriction)
+            if shared > 0:
+                rating = (round(shared / self._unions[i] * 1000, 2), self._items[i], self.movie)
+                if len(best) < limit:
+                    heapq.heappush(best, rating)
+                elif rating > best[0]:
+                    heapq.heapreplace(best, rating)
+        return sorted(best, reverse=True)
+
+    def sweep(self, limit: int, restrictions: Iterable[float]) -> dict[float, list[tuple[float, str, str]]]:
+        """Return a dictionary mapping each of the given restrictions to the recommendations of
+        Graph.recommend_movie for self.movie and that restriction.
+
+        The differences of each movie are only visited once for all of the restrictions.
+
+        Preconditions:
+            - limit >= 1
+        """
+        restrictions = sorted(set(restrictions))
+        all_ratings = {restriction: [] for restriction in restrictions}
+
+        differences = self._differences
+        for i, other in enumerate(self._items):
+            union = self._unions[i]
+            start = position = self._starts[i]
+            end = self._starts[i + 1]
+            for restriction in restrictions:
+                while position < end and differences[position] <= restriction:
+                    position += 1
+                if position > start:
+                    all_ratings[restriction].append((round((position - start) / union * 1000, 2), other, self.movie))
+
+        return {restriction: heapq.nlargest(limit, ratings) for restriction, ratings in all_ratings.items()}
+
+
+def two_hop_differences(vertex: _Vertex) -> tuple[dict[_Vertex, list[float]], dict[_Vertex, list[float]]]:
+    """Return the score differences and the advanced weight differences between the given movie vertex
+    and every movie sharing a reviewer with it, in one pass over its two-hop neighbourhood.
+
+    Each dictionary maps a movie vertex to the differences for each shared reviewer, in the same order.
+    """
+    differences = {}
+    advanced_differences = {}
+    for reviewer in vertex.neighbours:
+        our_weight, our_advanced_weight = vertex.weight(reviewer), vertex.advanced_weight(reviewer)
+        for other in reviewer.neighbours:
+            if other is not vertex:
+                if other not in differences:
+                    differences[other] = []
+                    advanced_differences[other] = []
+                differences[other].append(abs(our_weight - other.weight(reviewer)))
+                advanced_differences[other].append(abs(our_advanced_weight - other.advanced_weight(reviewer)))
+    return differences, advanced_differences
+
+
+class _AnytimeScan:
+    """The progress of Graph.recommend_movie_anytime through the two-hop neighbourhood of a movie, kept so
+    that a later call for the same movie can resume it.
+
+    The reviewers of the movie are visited from lowest to highest degree, so that the most reviewers are
+    visited for the time spent. The score differences of every candidate movie are collected along the way,
+    along with how many of them are within the current restriction, so that the recommendations so far are
+    found without sorting the differences.
+
+    Instance Attributes:
+        - seed: The movie vertex whose two-hop neighbourhood is visited.
+        - advanced: Whether the differences are between advanced weights.
+        - restriction: The restriction of the counts in self.within (math.inf for unweighted scores).
+        - differences: Maps each candidate movie vertex to the score differences of the shared reviewers
+          visited so far.
+        - within: Maps each candidate movie vertex to the number of its differences which are at most
+          self.restriction.
+        - work_done: The number of edges of the seed's reviewers visited so far.
+        - total_work: The number of edges of the seed's reviewers.
+
+    Representation Invariants:
+        - 0 <= self.work_done <= self.total_work
+        - self.within.keys() == self.differences.keys()
+    """
+    # Private Instance Attributes:
+    #     - _reviewers:
+    #         The reviewers of seed, from lowest to highest degree.
+    #     - _next_reviewer:
+    #         The position in _reviewers of the next reviewer to visit.
+    #     - _next_edge:
+    #         The number of edges of that reviewer which were already visited.
+    seed: _Vertex
+    advanced: bool
+    restriction: float
+    differences: dict[_Vertex, list[float]]
+    within: dict[_Vertex, int]
+    work_done: int
+    total_work: int
+    _reviewers: list[_Vertex]
+    _next_reviewer: int
+    _next_edge: int
+
+    def __init__(self, seed: _Vertex, advanced: bool, restriction: float) -> None:
+        """Initialize a scan of the given movie vertex which has not visited any edges yet."""
+        self.seed = seed
+        self.advanced = advanced
+        self.restriction = restriction
+        self.differences = {}
+        self.within = {}
+        self._reviewers = sorted(seed.neighbours, key=_Vertex.degree)
+        self.work_done = 0
+        self.total_work = sum(reviewer.degree() for reviewer in self._reviewers)
+        self._next_reviewer = 0
+        self._next_edge = 0
+
+    def is_complete(self) -> bool:
+        """Return whether every edge of the seed's reviewers has been visited."""
+        return self._next_reviewer == len(self._reviewers)
+
+    def set_restriction(self, restriction: float) -> None:
+        """Recount self.within for the given restriction, if it differs from self.restriction."""
+        if restriction != self.restriction:
+            self.restriction = restriction
+            self.within = {other: sum(1 for difference in differences if difference <= restriction)
+                           for other, differences in self.differences.items()}
+
+    def advance(self, deadline: Optional[float], finish_cost: float = 0.0) -> None:
+        """Visit the remaining edges, until every edge is visited or the deadline (a time.perf_counter()
+        value, or None for no deadline) is reached.
+
+        The deadline is checked every DEADLINE_CHECK_EDGES edges, including in the middle of a reviewer's
+        edges, so that a reviewer of many movies cannot run far past the deadline. finish_cost seconds per
+        candidate movie are kept before the deadline, for finding the recommendations afterwards.
+        """
+        seed, advanced, restriction = self.seed, self.advanced, self.restriction
+        differences, within = self.differences, self.within
+        until_check = DEADLINE_CHECK_EDGES
+        while self._next_reviewer < len(self._reviewers):
+            reviewer = self._reviewers[self._next_reviewer]
+            our_weight = seed.advanced_weight(reviewer) if advanced else seed.neighbours[reviewer][0]
+            visited = 0
+            for other, weight in itertools.islice(reviewer.neighbours.items(), self._next_edge, None):
+                if until_check == 0:
+                    if deadline is not None and time.perf_counter() + len(differences) * finish_cost > deadline:
+                        self._next_edge += visited
+                        self.work_done += visited
+                        return
+                    until_check = DEADLINE_CHECK_EDGES
+                until_check -= 1
+                visited += 1
+                if other is not seed:
+                    # The weight list is shared by both endpoints of the edge
+                    their_weight = round(weight[0] + weight[0] * weight[1], 1) if advanced else weight[0]
+                    difference = abs(our_weight - their_weight)
+                    if other in differences:
+                        differences[other].append(difference)
+                        within[other] += difference <= restriction
+                    else:
+                        differences[other] = [difference]
+                        within[other] = int(difference <= restriction)
+            self.work_done += visited
+            self._next_reviewer += 1
+            self._next_edge = 0
+
+    def recommend(self, limit: int) -> list[tuple[float, str, str]]:
+        """Return the recommendations of Graph.recommend_movie for self.seed and self.restriction,
+        counting only the shared reviewers visited so far.
+
+        A candidate's score is at most its count in self.within divided by the seed's degree, so the
+        candidates are visited in order of decreasing count, and the search stops once that bound is
+        below the score of the <limit>-th best movie found so far (as in Graph.recommend_movie_top).
+
+        Preconditions:
+            - limit >= 1
+        """
+        seed_degree, movie = self.seed.degree(), self.seed.item
+        # A min-heap of the <limit> best ratings found so far
+        best = []
+        for other in sorted(self.within, key=self.within.__getitem__, reverse=True):
+            count = self.within[other]
+            if count == 0 or (len(best) == limit and round(count / seed_degree * 1000, 2) < best[0][0]):
+                break
+            union = seed_degree + other.degree() - len(self.differences[other])
+            rating = (round(count / union * 1000, 2), other.item, movie)
+            if len(best) < limit:
+                heapq.heappush(best, rating)
+            elif rating > best[0]:
+                heapq.heapreplace(best, rating)
+        return sorted(best, reverse=True)
+
+
+class RecommendationResult:
+    """The recommendations of a time-bounded recommendation query.
+
+    Instance Attributes:
+        - recommendations: The recommended movies, as returned by Graph.recommend_movie.
+        - complete: Whether the query finished before its deadline, so that the recommendations are exact.
+        - coverage: The fraction of the query's work that was done before its deadline.
+
+    Representation Invariants:
+        - 0 <= self.coverage <= 1
+        - not self.complete or self.coverage == 1
+    """
+    recommendations: list[tuple[float, str, str]]
+    complete: bool
+    coverage: float
+
+    def __init__(self, recommendations: list[tuple[float, str, str]], complete: bool, coverage: float) -> None:
+        """Initialize a new recommendation result."""
+        self.recommendations = recommendations
+        self.complete = complete
+        self.coverage = coverage
+
+
+class ReviewFilter:
+    """A filter on the reviews used for recommendations, by publisher and by reviewer.
+
+    Empty include sets allow every publisher (or reviewer).
+
+    Instance Attributes:
+        - publishers: Only reviews from these publishers are used.
+        - excluded_publishers: Reviews from these publishers are not used.
+        - reviewers: Only reviews by these reviewers are used.
+        - excluded_reviewers: Reviews by these reviewers are not used.
+    """
+    publishers: set[str]
+    excluded_publishers: set[str]
+    reviewers: set[str]
+    excluded_reviewers: set[str]
+
+    def __init__(self, publishers: Iterable[str] = (), excluded_publishers: Iterable[str] = (),
+                 reviewers: Iterable[str] = (), excluded_reviewers: Iterable[str] = ()) -> None:
+        """Initialize a new review filter."""
+        self.publishers = set(publishers)
+        self.excluded_publishers = set(excluded_publishers)
+        self.reviewers = set(reviewers)
+        self.excluded_reviewers = set(excluded_reviewers)
+
+    def allows(self, reviewer: str, publisher: str) -> bool:
+        """Return whether this filter allows a review by the given reviewer from the given publisher.
+
+        >>> ReviewFilter(publishers={'Times'}, excluded_reviewers={'Critic 1'}).allows('Critic 2', 'Times')
+        True
+        >>> ReviewFilter(publishers={'Times'}, excluded_reviewers={'Critic 1'}).allows('Critic 1', 'Times')
+        False
+        """
+        return (not self.publishers or publisher in self.publishers) \
+            and publisher not in self.excluded_publishers \
+            and (not self.reviewers or reviewer in self.reviewers) \
+            and reviewer not in self.excluded_reviewers
+
+
+def _to_bitmap(indices: Iterable[int]) -> int:
+    """Return the bitmap with the given indices set.
+
+    The bits are set in a byte array, so that building a bitmap takes linear time rather than
+    creating a new (ever larger) int for every index.
+    """
+    indices = list(indices)
+    if not indices:
+        return 0
+    bits = bytearray(max(indices) // 8 + 1)
+    for i in indices:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, 'little')
+
+
+# The positions of the set bits of each byte value
+_BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+# Matches a non-zero byte
+_NONZERO_BYTE = re.compile(rb'[^\x00]')
+
+
+def _iter_bits(bitmap: int) -> Iterable[int]:
+    """Yield the indices of the set bits of the given (non-negative) bitmap, from lowest to highest.
+
+    The bitmap is converted to bytes once, its non-zero bytes are found with a regular expression (so
+    that the runs of zero bytes in sparse bitmaps are skipped quickly), and the bits of each byte are
+    looked up in a table. This takes linear time, rather than creating a new int for every set bit.
+
+    >>> list(_iter_bits(0b101001))
+    [0, 3, 5]
+    >>> list(_iter_bits(1 << 20 | 1 << 9))
+    [9, 20]
+    """
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for match in _NONZERO_BYTE.finditer(data):
+        base = match.start() * 8
+        for bit in _BYTE_BITS[data[match.start()]]:
+            yield base + bit
+
+
 class Graph:
     """A (weighted) graph.
 
@@ -119,11 +661,130 @@ class Graph:
     #     - _vertices:
     #         A collection of the vertices contained in this graph.
     #         Maps item to _Vertex object.
+    #     - _sweeps:
+    #         The most recently used restriction sweeps.
+    #         Maps (movie, advanced) to the RestrictionSweep of the movie, from least to most
+    #         recently used.
+    #     - _cached_size:
+    #         The total size of the sweeps in _sweeps.
+    #     - _scans:
+    #         The scans of recommend_movie_anytime which were not turned into restriction sweeps, from
+    #         least to most recently used. Maps (movie, advanced) to the scan of the movie.
+    #     - _finish_cost:
+    #         The last measured time (in seconds) per candidate movie for a scan of recommend_movie_anytime
+    #         to find its recommendations.
+    #     - _latest_date:
+    #         The latest review date (as an ordinal) of any edge, or 0 if there are no dated edges.
+    #     - _indexed:
+    #         Maps each kind to the list of the vertices of that kind, in order of their index.
+    #     - _publisher_bitmaps:
+    #         Maps each publisher to the bitmap of the reviewers with a review from that publisher.
+    #     - _multi_publisher_reviewers:
+    #         The reviewers with reviews from more than one publisher, whose reviews must be checked
+    #         one by one when filtering by publisher.
+    #     - _bitmaps_stale:
+    #         Whether edges were added since the vertex and publisher bitmaps were last built.
+    #     - _sentiment_source:
+    #         The object which computes the sentiment scores of edges loaded without them,
+    #         or None if every sentiment score is known.
+    #     - _degree_index:
+    #         The degrees of the movie vertices in increasing order, with the movie vertices in the same
+    #         order, or None if it must be rebuilt.
     _vertices: dict[Any, _Vertex]
+    _sweeps: dict[tuple[Any, bool], RestrictionSweep]
+    _cached_size: int
+    _scans: dict[tuple[Any, bool], _AnytimeScan]
+    _finish_cost: float
+    _latest_date: int
+    _indexed: dict[str, list[_Vertex]]
+    _publisher_bitmaps: dict[str, int]
+    _multi_publisher_reviewers: set[_Vertex]
+    _bitmaps_stale: bool
+    _sentiment_source: Optional[Any]
+    _degree_index: Optional[tuple[list[int], list[_Vertex]]]
 
     def __init__(self) -> None:
         """Initialize an empty graph (no vertices or edges)."""
         self._vertices = {}
+        self._sweeps = {}
+        self._cached_size = 0
+        self._scans = {}
+        self._finish_cost = FINISH_COST_ESTIMATE
+        self._latest_date = 0
+        self._indexed = {}
+        self._publisher_bitmaps = {}
+        self._multi_publisher_reviewers = set()
+        self._bitmaps_stale = False
+        self._sentiment_source = None
+        self._degree_index = None
+
+    def __getstate__(self) -> dict:
+        """Return the state of this graph for pickling.
+
+        The vertices and edges are stored as flat lists, since pickling the _Vertex objects directly
+        recurses through every neighbour and exceeds the recursion limit on large graphs.
+        """
+        vertices = [(v.item, v.kind) for v in self._vertices.values()]
+        edges = []
+        for v in self._vertices.values():
+            for u, weight in v.neighbours.items():
+                if v.kind == 'movie' or u.kind != 'movie':
+                    edges.append((v.item, u.item, weight))
+        return {'vertices': vertices, 'edges': edges, 'sentiment_source': self._sentiment_source}
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore this graph from a state returned by __getstate__."""
+        self.__init__()
+        with self.bulk_load():
+            for item, kind in state['vertices']:
+                self.add_vertex(item, kind)
+            for item1, item2, weight in state['edges']:
+                self.add_edge(item1, item2, weight)
+        self._sentiment_source = state.get('sentiment_source')
+
+    def set_sentiment_source(self, sentiment_source: Optional[Any]) -> None:
+        """Set the object which computes the sentiment scores of the edges added without them.
+
+        Such edges have None as their sentiment score, followed by the location of their review.
+        sentiment_source must have a method resolve(weights), which sets the sentiment score of each
+        of the given edge weights (e.g. database_import.LazySentiment).
+
+        The sentiment scores are computed the first time an advanced weight of the edges' vertices
+        (or of the two-hop neighbourhood of a recommended movie) is needed, and are then kept.
+        """
+        self._sentiment_source = sentiment_source
+
+    def resolve_sentiment(self) -> None:
+        """Compute every missing sentiment score of this graph, in one batch."""
+        self._ensure_sentiment(self._vertices.values())
+        # There are no edges left without a sentiment score
+        self._sentiment_source = None
+
+    def _ensure_sentiment(self, vertices: Iterable[_Vertex]) -> None:
+        """Compute the missing sentiment scores of the edges of the given vertices, in one batch."""
+        if self._sentiment_source is None:
+            return
+        pending = {}
+        for v in vertices:
+            for weight in v.neighbours.values():
+                if weight[1] is None:
+                    pending[id(weight)] = weight
+        if pending:
+            self._sentiment_source.resolve(list(pending.values()))
+
+    @contextmanager
+    def bulk_load(self) -> Iterator[None]:
+        """Add every vertex and edge within this context as one batch.
+
+        The bitmaps of the vertices and publishers are built once, at the end of the batch, and loaders
+        can treat an in-memory graph the same as a sqlite_graph.SQLiteGraph.
+        """
+        yield
+        self._ensure_bitmaps()
+
+    def clear(self) -> None:
+        """Remove every vertex and edge from this graph."""
+        self.__init__()
 
     def add_vertex(self, item: Any, kind: str) -> None:
         """Add a vertex with the given item to this graph.
@@ -134,12 +795,18 @@ class Graph:
             - item not in self._vertices
         """
         if item not in self._vertices:
-            self._vertices[item] = _Vertex(item, kind, {})
+            indexed = self._indexed.setdefault(kind, [])
+            self._vertices[item] = _Vertex(item, kind, {}, len(indexed))
+            indexed.append(self._vertices[item])
+            self._degree_index = None
 
     def add_edge(self, item1: Any, item2: Any, weight: list[float]) -> None:
         """Add an edge between the two vertices with the given items in this graph,
         with the given weight.
 
+        The weight is a list of [score, sentiment score], optionally followed by the review date
+        (an ordinal as returned by datetime.date.toordinal) and the publisher.
+
         Raise a ValueError if item1 or item2 do not appear as vertices in this graph.
 
         Preconditions:
@@ -148,14 +815,49 @@ class Graph:
         if item1 in self._vertices and item2 in self._vertices:
             v1 = self._vertices[item1]
             v2 = self._vertices[item2]
+            if len(weight) < 4:
+                weight = list(weight) + [0, ''][len(weight) - 2:]
 
             # Add the new edge
             v1.neighbours[v2] = weight
             v2.neighbours[v1] = weight
+            v1.date_index = v2.date_index = None
+            self._latest_date = max(self._latest_date, weight[2])
+
+            # The bitmaps, cached sweeps and scans and degrees may now be outdated
+            self._bitmaps_stale = True
+            self._sweeps.clear()
+            self._cached_size = 0
+            self._scans.clear()
+            self._degree_index = None
         else:
             # We didn't find an existing vertex for both items.
             raise ValueError
 
+    def _ensure_bitmaps(self) -> None:
+        """Rebuild the bitmaps of every vertex and publisher, if edges were added since they were last built.
+
+        The bitmaps are rebuilt in one pass, rather than updated with every edge, since every update
+        would copy the whole (ever larger) bitmap.
+        """
+        if not self._bitmaps_stale:
+            return
+        publisher_reviewers = {}
+        multi_publisher_reviewers = set()
+        for v in self._vertices.values():
+            v.bitmap = _to_bitmap(u.index for u in v.neighbours)
+            if v.kind == 'user':
+                publishers = {weight[3] for weight in v.neighbours.values()}
+                if len(publishers) > 1:
+                    multi_publisher_reviewers.add(v)
+                for publisher in publishers:
+                    publisher_reviewers.setdefault(publisher, []).append(v.index)
+
+        self._publisher_bitmaps = {publisher: _to_bitmap(reviewers)
+                                   for publisher, reviewers in publisher_reviewers.items()}
+        self._multi_publisher_reviewers = multi_publisher_reviewers
+        self._bitmaps_stale = False
+
     def adjacent(self, item1: Any, item2: Any) -> bool:
         """Return whether item1 and item2 are adjacent vertices in this graph.
 
@@ -193,6 +895,10 @@ class Graph:
         else:
             return set(self._vertices.keys())
 
+    def count_edges(self) -> int:
+        """Return the number of edges in this graph."""
+        return sum(v.degree() for v in self._vertices.values()) // 2
+
     def get_weight(self, item1: Any, item2: Any, advanced: bool = False) -> Union[int, float]:
         """Return the weight of the edge between the given items.
 
@@ -205,6 +911,7 @@ class Graph:
         v2 = self._vertices[item2]
 
         if advanced:
+            self._ensure_sentiment([v1])
             return v1.advanced_weight(v2)
         else:
             return v1.weight(v2)
@@ -229,32 +936,42 @@ class Graph:
             - max_vertices > 0
         """
         graph_nx = nx.Graph()
+        exported = []
+        edges = []
         for v in self._vertices.values():
             if v.item not in graph_nx and graph_nx.number_of_nodes() < max_vertices:
                 graph_nx.add_node(v.item, kind=v.kind)
             if v.item in graph_nx:
+                exported.append(v)
                 for u in v.neighbours:
                     if u.item not in graph_nx:
                         if graph_nx.number_of_nodes() < max_vertices:
                             graph_nx.add_node(u.item, kind=u.kind)
                         else:
                             continue
-                    score = v.neighbours[u][0]
-                    sentiment = v.neighbours[u][1]
-                    if advanced:
-                        advanced_weight = v.advanced_weight(u)
-                        graph_nx.add_edge(v.item, u.item,
-                                          score=score,
-                                          sentiment=sentiment,
-                                          advanced_weight=advanced_weight)
-                    else:
-                        graph_nx.add_edge(v.item, u.item,
-                                          score=score,
-                                          sentiment=sentiment)
+                    edges.append((v, u))
+
+        # The sentiment scores of every exported edge are computed in one batch
+        self._ensure_sentiment(exported)
+        for v, u in edges:
+            score = v.neighbours[u][0]
+            sentiment = v.neighbours[u][1]
+            if advanced:
+                advanced_weight = v.advanced_weight(u)
+                graph_nx.add_edge(v.item, u.item,
+                                  score=score,
+                                  sentiment=sentiment,
+                                  advanced_weight=advanced_weight)
+            else:
+                graph_nx.add_edge(v.item, u.item,
+                                  score=score,
+                                  sentiment=sentiment)
         return graph_nx
 
     def get_similarity_score(self, item1: Any, item2: Any,
-                             score_type: str = 'unweighted', restriction: int = 5) -> float:
+                             score_type: str = 'unweighted', restriction: int = 5,
+                             window: Optional[tuple[datetime.date, datetime.date]] = None,
+                             half_life: float = 0, review_filter: Optional[ReviewFilter] = None) -> float:
         """Return the similarity score between the two given items in this graph.
 
         The similarity score will be based on the score_type, which can be 'unweighted',
@@ -262,14 +979,38 @@ class Graph:
         which will determines how similar the scores should be (only applies to 'weighted'
         and 'advanced_weighted')
 
-        Raise a ValueError if item1 or item2 do not appear as vertices in this graph.
+        If a window (start date, end date) is given, only the reviews written within it (inclusive)
+        are used. If half_life > 0, each review counts less the older it is, halving every half_life
+        days before the end of the window (or the latest review). Reviews without a date are only
+        used when there is neither a window nor a half_life.
+
+        If a review_filter is given, only the reviews it allows are used.
+
+        Raise a ValueError if item1 or item2 do not appear as vertices in this graph, or if a review_filter
+        is given along with a window or half_life (which cannot be combined).
 
         Preconditions:
             - score_type in {'unweighted', 'weighted', 'advanced_weighted'}
             - restriction >= 0
+            - window is None or window[0] <= window[1]
+            - half_life >= 0
         """
+        if review_filter is not None and (window is not None or half_life > 0):
+            raise ValueError
         if item1 in self._vertices and item2 in self._vertices:
-            if score_type == 'unweighted':
+            if score_type == 'advanced_weighted':
+                self._ensure_sentiment([self._vertices[item1], self._vertices[item2]])
+
+            if review_filter is not None:
+                v1, v2 = self._vertices[item1], self._vertices[item2]
+                mask = self._filter_mask(review_filter)
+                return self._similarity_score_filtered(v1, self._filter_bitmap(v1, review_filter, mask),
+                                                       v2, self._filter_bitmap(v2, review_filter, mask),
+                                                       review_filter, score_type, restriction)
+            elif window is not None or half_life > 0:
+                return self._vertices[item1].similarity_score_windowed(
+                    self._vertices[item2], score_type, restriction, self._window(window, half_life))
+            elif score_type == 'unweighted':
                 return self._vertices[item1].similarity_score_unweighted(self._vertices[item2])
             elif score_type == 'weighted':
                 return self._vertices[item1].similarity_score_weighted(self._vertices[item2], restriction)
@@ -278,33 +1019,436 @@ class Graph:
         else:
             raise ValueError
 
+    def restriction_sweep(self, movie: str, advanced: bool = False) -> RestrictionSweep:
+        """Return the restriction sweep of the given movie, for weighted (or advanced weighted) scores.
+
+        The sweep is cached, so that recommendations for the same movie with a different restriction
+        do not recompute the shared reviewers.
+
+        Preconditions:
+            - movie in self._vertices
+            - self._vertices[movie].kind == 'movie'
+        """
+        key = (movie, advanced)
+        if key in self._sweeps:
+            # Mark as the most recently used
+            sweep = self._sweeps.pop(key)
+            self._sweeps[key] = sweep
+        else:
+            if advanced:
+                self._ensure_sentiment(self._vertices[movie].neighbours)
+            sweep = RestrictionSweep(self._vertices[movie], advanced)
+            self._cache_sweep(sweep)
+        return sweep
+
+    def _cache_sweep(self, sweep: RestrictionSweep) -> None:
+        """Add the given sweep to the cached sweeps, as the most recently used.
+
+        The least recently used sweeps are removed until the cached sweeps hold at most
+        MAX_CACHED_SWEEP_SIZE values. A sweep larger than that on its own is not cached.
+        """
+        key = (sweep.movie, sweep.advanced)
+        if key in self._sweeps:
+            self._cached_size -= self._sweeps.pop(key).size
+        if sweep.size > MAX_CACHED_SWEEP_SIZE:
+            return
+        while self._cached_size + sweep.size > MAX_CACHED_SWEEP_SIZE:
+            self._cached_size -= self._sweeps.pop(next(iter(self._sweeps))).size
+        self._sweeps[key] = sweep
+        self._cached_size += sweep.size
+
+    def compare_recommendations(self, movie: str, limit: int, restrictions: Iterable[int] = (5,)) \
+            -> dict[tuple[str, int], list[tuple[float, str, str]]]:
+        """Return a dictionary mapping (score_type, restriction) to the recommendations of recommend_movie
+        for the given movie, for every score type and every one of the given restrictions.
+
+        The shared reviewers of the given movie and every other movie are only found once, and both
+        weighted sweeps are built from them (and cached, as in restriction_sweep). The unweighted scores
+        are the weighted scores without a restriction, so every restriction maps to the same unweighted
+        recommendations.
+
+        Preconditions:
+            - movie in self._vertices
+            - self._vertices[movie].kind == 'movie'
+            - limit >= 1
+            - all(restriction >= 0 for restriction in restrictions)
+        """
+        restrictions = list(restrictions)
+        if (movie, False) in self._sweeps and (movie, True) in self._sweeps:
+            sweeps = (self.restriction_sweep(movie, False), self.restriction_sweep(movie, True))
+        else:
+            vertex = self._vertices[movie]
+            self._ensure_sentiment(vertex.neighbours)
+            differences, advanced_differences = two_hop_differences(vertex)
+            sweeps = (RestrictionSweep(vertex, False, differences),
+                      RestrictionSweep(vertex, True, advanced_differences))
+            for sweep in sweeps:
+                self._cache_sweep(sweep)
+
+        weighted = sweeps[0].sweep(limit, restrictions + [math.inf])
+        advanced_weighted = sweeps[1].sweep(limit, restrictions)
+        comparison = {}
+        for restriction in restrictions:
+            comparison[('unweighted', restriction)] = weighted[math.inf]
+            comparison[('weighted', restriction)] = weighted[restriction]
+            comparison[('advanced_weighted', restriction)] = advanced_weighted[restriction]
+        return comparison
+
     def recommend_movie(self, movie: str, limit: int,
-                        score_type: str = 'unweighted', restriction: int = 5) -> list[tuple[float, str, str]]:
+                        score_type: str = 'unweighted', restriction: int = 5,
+                        window: Optional[tuple[datetime.date, datetime.date]] = None,
+                        half_life: float = 0,
+                        review_filter: Optional[ReviewFilter] = None) -> list[tuple[float, str, str]]:
         """Return a list of tuples of up to <limit> recommended movies based on similarity to the given movie.
         The tuple will contain the following information: movie title, similarity score, similar to
 
+        The window, half_life and review_filter restrict and weight the reviews used, as in
+        get_similarity_score.
+
+        Raise a ValueError if a review_filter is given along with a window or half_life.
+
         Preconditions:
             - movie in self._vertices
             - self._vertices[movie].kind == 'movie'
             - limit >= 1
             - score_type in {'unweighted' , 'weighted', 'advanced_weighted'}
             - restriction >= 0
+            - window is None or window[0] <= window[1]
+            - half_life >= 0
         """
-        # A list of tuples between similarity score and book title
+        if review_filter is not None and (window is not None or half_life > 0):
+            raise ValueError
+        if score_type == 'advanced_weighted':
+            # The sentiment scores of every edge from the movie's reviewers may be needed
+            self._ensure_sentiment(self._vertices[movie].neighbours)
+
+        if review_filter is not None:
+            return self._recommend_movie_filtered(movie, limit, score_type, restriction, review_filter)
+        elif window is not None or half_life > 0:
+            return self._recommend_movie_windowed(movie, limit, score_type, restriction,
+                                                  self._window(window, half_life))
+
+        if score_type != 'unweighted':
+            # Only the restriction differs between the weighted scores of the same movie
+            return self.restriction_sweep(movie, score_type == 'advanced_weighted').recommend(limit, restriction)
+
+        return self.recommend_movie_top(movie, limit)
+
+    def recommend_movie_top(self, movie: str, limit: int, score_type: str = 'unweighted',
+                            restriction: int = 5,
+                            stats: Optional[dict[str, int]] = None) -> list[tuple[float, str, str]]:
+        """Return the same recommendations as recommend_movie, without scoring every movie.
+
+        The similarity score of two movies with d1 and d2 reviewers is at most min(d1, d2) / max(d1, d2),
+        for every score type. Candidate movies are visited in order of decreasing upper bound (outwards
+        from the given movie's degree), and the search stops once the bound is below the score of the
+        <limit>-th best movie found so far. A candidate's number of shared reviewers gives a tighter bound,
+        which is checked before its reviewers' scores are compared.
+
+        If stats is given, it is filled with the number of candidate movies 'skipped' (never visited),
+        'pruned' (rejected by the number of shared reviewers) and 'scored'.
+
+        Preconditions:
+            - movie in self._vertices
+            - self._vertices[movie].kind == 'movie'
+            - limit >= 1
+            - score_type in {'unweighted' , 'weighted', 'advanced_weighted'}
+            - restriction >= 0
+        """
+        seed = self._vertices[movie]
+        if score_type == 'advanced_weighted':
+            self._ensure_sentiment(seed.neighbours)
+        if self._degree_index is None:
+            movies = sorted(self._indexed.get('movie', []), key=_Vertex.degree)
+            self._degree_index = ([v.degree() for v in movies], movies)
+        degrees, movies = self._degree_index
+        self._ensure_bitmaps()
+
+        seed_degree = seed.degree()
+        # The next candidates with a lower (or equal) and a higher degree than the seed
+        lower = bisect.bisect_right(degrees, seed_degree) - 1
+        higher = lower + 1
+        # A min-heap of the <limit> best ratings found so far
+        best = []
+        pruned = scored = 0
+        while lower >= 0 or higher < len(movies):
+            if higher >= len(movies) or (lower >= 0 and degrees[lower] * degrees[higher] >= seed_degree ** 2):
+                # degrees[lower] / seed_degree >= seed_degree / degrees[higher]
+                other = movies[lower]
+                lower -= 1
+            else:
+                other = movies[higher]
+                higher += 1
+
+            bound = min(seed_degree, other.degree()) / max(seed_degree, other.degree(), 1)
+            if bound == 0 or (len(best) == limit and round(bound * 1000, 2) < best[0][0]):
+                break
+            if other is seed:
+                continue
+
+            shared = (seed.bitmap & other.bitmap).bit_count()
+            union = seed_degree + other.degree() - shared
+            if shared == 0 or (len(best) == limit and round(shared / union * 1000, 2) < best[0][0]):
+                pruned += 1
+                continue
+
+            scored += 1
+            if score_type != 'unweighted':
+                shared = self._count_within_restriction(seed, other, score_type == 'advanced_weighted',
+                                                        restriction)
+            if shared > 0:
+                rating = (round(shared / union * 1000, 2), other.item, movie)
+                if len(best) < limit:
+                    heapq.heappush(best, rating)
+                elif rating > best[0]:
+                    heapq.heapreplace(best, rating)
+
+        if stats is not None:
+            stats['pruned'] = pruned
+            stats['scored'] = scored
+            stats['skipped'] = len(movies) - 1 - pruned - scored
+        return sorted(best, reverse=True)
+
+    def _count_within_restriction(self, v1: _Vertex, v2: _Vertex, advanced: bool, restriction: int) -> int:
+        """Return the number of shared reviewers of v1 and v2 whose scores of them differ by at most
+        restriction (using the advanced weights if advanced is True).
+        """
+        if len(v2.neighbours) < len(v1.neighbours):
+            v1, v2 = v2, v1
+        count = 0
+        for reviewer, weight in v1.neighbours.items():
+            if reviewer in v2.neighbours:
+                if advanced:
+                    difference = v1.advanced_weight(reviewer) - v2.advanced_weight(reviewer)
+                else:
+                    difference = weight[0] - v2.neighbours[reviewer][0]
+                if abs(difference) <= restriction:
+                    count += 1
+        return count
+
+    def recommend_movie_anytime(self, movie: str, limit: int, score_type: str = 'unweighted',
+                                restriction: int = 5, budget_ms: Optional[float] = None) -> RecommendationResult:
+        """Return up to <limit> recommended movies based on similarity to the given movie, as in
+        recommend_movie, computed within budget_ms milliseconds (or without a time limit, if None).
+
+        The edges of the given movie's reviewers are visited from the lowest to the highest degree reviewer
+        (see _AnytimeScan). If the deadline is reached first, the best recommendations so far are returned,
+        computed from the edges visited, and the result records the fraction of the edges visited. The
+        scan is kept, and the next call for the same movie resumes it, so that repeating the query refines
+        the recommendations until they are exact. The time to find the recommendations of the scan is
+        measured and kept out of the budget of the next calls.
+
+        Without a time limit, a completed scan is turned into a restriction sweep and cached (see
+        restriction_sweep), and a cached sweep of the movie is used instead of a scan, so that repeating
+        the query with another restriction is immediate. Sorting the differences of a sweep would not fit
+        in a time budget, so with one, a completed scan is kept as it is and reused. Unweighted scores are
+        weighted scores without a restriction.
+
+        Preconditions:
+            - movie in self._vertices
+            - self._vertices[movie].kind == 'movie'
+            - limit >= 1
+            - score_type in {'unweighted' , 'weighted', 'advanced_weighted'}
+            - restriction >= 0
+            - budget_ms is None or budget_ms >= 0
+        """
+        advanced = score_type == 'advanced_weighted'
+        if score_type == 'unweighted':
+            restriction = math.inf
+            keys = [(movie, False), (movie, True)]
+        else:
+            keys = [(movie, advanced)]
+        cached = [key for key in keys if key in self._sweeps]
+        if cached:
+            sweep = self.restriction_sweep(*cached[0])
+            return RecommendationResult(sweep.recommend(limit, restriction), True, 1.0)
+
+        seed = self._vertices[movie]
+        if advanced:
+            self._ensure_sentiment(seed.neighbours)
+        # Computing missing sentiment scores is not counted in the time budget, since the
+        # recommendations cannot be scored at all without them
+        deadline = None if budget_ms is None else time.perf_counter() + budget_ms / 1000
+
+        scanned = [key for key in keys if key in self._scans]
+        if scanned:
+            scan = self._scans.pop(scanned[0])
+            scan.set_restriction(restriction)
+        else:
+            scan = _AnytimeScan(seed, advanced, restriction)
+        scan.advance(deadline, self._finish_cost)
+
+        start = time.perf_counter()
+        recommendations = scan.recommend(limit)
+        if scan.within:
+            self._finish_cost = (time.perf_counter() - start) / len(scan.within)
+
+        if scan.is_complete() and deadline is None:
+            self._cache_sweep(RestrictionSweep(seed, scan.advanced, scan.differences))
+        else:
+            self._scans[(movie, scan.advanced)] = scan
+            if len(self._scans) > MAX_CACHED_SCANS:
+                self._scans.pop(next(iter(self._scans)))
+
+        if scan.is_complete():
+            return RecommendationResult(recommendations, True, 1.0)
+        return RecommendationResult(recommendations, False, scan.work_done / scan.total_work)
+
+    def _recommend_movie_windowed(self, movie: str, limit: int, score_type: str, restriction: int,
+                                  window: tuple[int, int, int, float]) -> list[tuple[float, str, str]]:
+        """Return the recommendations of recommend_movie using only the reviews in the given window,
+        as returned by _window.
+
+        Only the edges within the window are visited, for the given movie, its reviewers and the
+        candidate movies.
+        """
+        seed = self._vertices[movie]
+        seed_weights = seed.window_weights(*window)
+
+        # Maps each candidate movie to [shared weight, shared weight within restriction]
+        shared = {}
+        for reviewer, seed_weight in seed_weights.items():
+            for other, other_weight in reviewer.window_weights(*window).items():
+                if other is not seed:
+                    weight = min(seed_weight, other_weight)
+                    totals = shared.setdefault(other, [0, 0])
+                    totals[0] += weight
+                    if _within_restriction(seed, other, reviewer, score_type, restriction):
+                        totals[1] += weight
+
+        seed_total = sum(seed_weights.values())
         ratings = []
+        for other, (shared_weight, shared_restrict) in shared.items():
+            union = seed_total + other.window_total(*window) - shared_weight
+            if shared_restrict > 0 and union > 0:
+                ratings.append((round(shared_restrict / union * 1000, 2), other.item, movie))
+
+        ratings.sort(reverse=True)
+        return ratings[:limit]
 
-        # Add other book items and their similarity score with *book*
-        for movie_item in self.get_all_vertices('movie'):
-            if movie_item != movie:
-                similarity_score = self.get_similarity_score(movie, movie_item, score_type, restriction)
-                if similarity_score > 0.0:
-                    ratings.append((round(similarity_score * 1000, 2), movie_item, movie))
+    def _recommend_movie_filtered(self, movie: str, limit: int, score_type: str, restriction: int,
+                                  review_filter: ReviewFilter) -> list[tuple[float, str, str]]:
+        """Return the recommendations of recommend_movie using only the reviews allowed by review_filter.
+
+        The candidate movies are the union of the movie bitmaps of the allowed reviewers of the given movie,
+        and each candidate's allowed reviewers are found by intersecting bitmaps, rather than by checking
+        each edge.
+        """
+        seed = self._vertices[movie]
+        mask = self._filter_mask(review_filter)
+        seed_bitmap = self._filter_bitmap(seed, review_filter, mask)
+        reviewers = self._indexed.get('user', [])
+        movies = self._indexed.get('movie', [])
+
+        candidates = 0
+        for i in _iter_bits(seed_bitmap):
+            candidates |= reviewers[i].bitmap
+        candidates &= ~(1 << seed.index)
+
+        ratings = []
+        for i in _iter_bits(candidates):
+            other = movies[i]
+            other_bitmap = self._filter_bitmap(other, review_filter, mask)
+            similarity_score = self._similarity_score_filtered(seed, seed_bitmap, other, other_bitmap,
+                                                               review_filter, score_type, restriction)
+            if similarity_score > 0.0:
+                ratings.append((round(similarity_score * 1000, 2), other.item, movie))
 
-        # Sort ratings from highest to lowest
         ratings.sort(reverse=True)
+        return ratings[:limit]
+
+    def _similarity_score_filtered(self, v1: _Vertex, bitmap1: int, v2: _Vertex, bitmap2: int,
+                                   review_filter: ReviewFilter, score_type: str, restriction: int) -> float:
+        """Return the similarity score between the movie vertices v1 and v2, using only their reviewers
+        in the given bitmaps (as returned by _filter_bitmap for review_filter).
 
-        # Return min{limit. len(ratings)} recommended books
-        return [ratings[i] for i in range(min(limit, len(ratings)))]
+        The shared reviewers within the restriction are found from the neighbours of the vertex with
+        the lower degree, rather than from the bits of the (long and sparse) shared bitmap.
+        """
+        union = (bitmap1 | bitmap2).bit_count()
+        if union == 0:
+            return 0
+        if score_type == 'unweighted':
+            return (bitmap1 & bitmap2).bit_count() / union
+
+        if v2.degree() < v1.degree():
+            v1, v2 = v2, v1
+        shared_restrict = 0
+        for reviewer, weight in v1.neighbours.items():
+            if reviewer in v2.neighbours and review_filter.allows(reviewer.item, weight[3]) \
+                    and review_filter.allows(reviewer.item, v2.neighbours[reviewer][3]) \
+                    and _within_restriction(v1, v2, reviewer, score_type, restriction):
+                shared_restrict += 1
+        return shared_restrict / union
+
+    def _filter_bitmap(self, vertex: _Vertex, review_filter: ReviewFilter, mask: int) -> int:
+        """Return the bitmap of the reviewers of the given movie vertex whose review is allowed by review_filter.
+
+        mask is the bitmap returned by _filter_mask for review_filter. Only the reviews of multi-publisher
+        reviewers are checked one by one.
+        """
+        allowed_indices = [reviewer.index for reviewer, weight in vertex.neighbours.items()
+                           if reviewer in self._multi_publisher_reviewers
+                           and review_filter.allows(reviewer.item, weight[3])]
+        return vertex.bitmap & mask | _to_bitmap(allowed_indices)
+
+    def _filter_mask(self, review_filter: ReviewFilter) -> int:
+        """Return the bitmap of the reviewers with a single publisher whose reviews are allowed by
+        review_filter.
+
+        The bitmaps are rebuilt first if they are outdated.
+        """
+        self._ensure_bitmaps()
+        allowed = -1
+        if review_filter.reviewers:
+            allowed = _to_bitmap(self._vertices[reviewer].index for reviewer in review_filter.reviewers
+                                 if reviewer in self._vertices)
+        excluded = [self._vertices[reviewer].index for reviewer in review_filter.excluded_reviewers
+                    if reviewer in self._vertices]
+        excluded.extend(reviewer.index for reviewer in self._multi_publisher_reviewers)
+        allowed &= ~_to_bitmap(excluded)
+
+        if review_filter.publishers:
+            publisher_bitmap = 0
+            for publisher in review_filter.publishers:
+                publisher_bitmap |= self._publisher_bitmaps.get(publisher, 0)
+            allowed &= publisher_bitmap
+        for publisher in review_filter.excluded_publishers:
+            allowed &= ~self._publisher_bitmaps.get(publisher, 0)
+        return allowed
+
+    def _window(self, window: Optional[tuple[datetime.date, datetime.date]],
+                half_life: float) -> tuple[int, int, int, float]:
+        """Return the (start, end, reference, half_life) tuple used by _Vertex.window_weights for the given
+        window (or every dated review, if window is None) and half_life.
+        """
+        if window is None:
+            return (1, max(self._latest_date, 1), self._latest_date, half_life)
+        start, end = window
+        return (start.toordinal(), end.toordinal(), end.toordinal(), half_life)
+
+
+def estimate_memory(num_vertices: int, num_edges: int) -> int:
+    """Return an estimate of the memory used (in bytes) by a Graph with the given number of
+    vertices and edges.
+
+    The estimate accounts for the _Vertex objects, their neighbour dictionaries and the
+    edge weight lists, but not the items (movie titles and reviewers) themselves, nor the
+    date indexes built by windowed queries. Neither does it account for the neighbour bitmaps,
+    whose size depends on the indices of each vertex's neighbours rather than on the number
+    of vertices and edges.
+
+    Preconditions:
+        - num_vertices >= 0
+        - num_edges >= 0
+    """
+    vertex = _Vertex('', 'movie', {})
+    # _Vertex object, its attribute dictionary and its (empty) neighbour dictionary, plus
+    # one entry (hash, key, value) in Graph._vertices
+    vertex_size = sys.getsizeof(vertex) + sys.getsizeof(vertex.__dict__) + sys.getsizeof({}) + 3 * 8
+    # The weight list and its values, plus one entry in each endpoint's neighbour dictionary
+    edge_size = sys.getsizeof([0.0, 0.0, 0, '']) + 3 * sys.getsizeof(0.0) + 2 * 3 * 8
+    return num_vertices * vertex_size + num_edges * edge_size
 
 
 if __name__ == "__main__":
@@ -313,7 +1457,8 @@ if __name__ == "__main__":
 
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['networkx'],
+        'extra-imports': ['networkx', 'array', 'bisect', 'contextlib', 'datetime', 'heapq', 'itertools', 'math', 're',
+                          'sys', 'time'],
         'disable': ['R1702'],
         'allowed-io': [],
         'max-line-length': 120
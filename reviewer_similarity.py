@@ -0,0 +1,229 @@
+"""CSC111 Project 2: FilmRecommandeur - Reviewer Similarity
+
+This Python module contains the reviewer-to-reviewer similarity engine, which finds the
+critics whose scoring patterns best match a given reviewer (or a given set of rated movies)
+and uses their scores to recommend movies ("critics like you").
+
+Copyright and Usage Information
+===============================
+This file (and other respective files associated with this project) is licensed
+under the MIT License. Please consult LICENSE for further details.
+
+Copyright (c) 2025 Minh Nguyen & Yifan Qiu
+"""
+from __future__ import annotations
+import math
+
+from graph import Graph
+
+# The number of shared movies at which a neighbour's similarity is no longer shrunk
+# towards 0. Reviewers who only overlap on one or two movies are otherwise (wrongly)
+# considered perfect matches.
+SHRINKAGE = 10
+
+# The total similarity of the neighbours who reviewed a movie at which its predicted score is halfway
+# between the movie's average score and the neighbours' (weighted) scores. A movie reviewed by a single
+# neighbour is otherwise predicted to get exactly that neighbour's score.
+PREDICTION_SHRINKAGE = 2.0
+
+# The number of reviews at which a movie's own average score counts as much as the average of every
+# review, in the baseline of its predicted score. A movie with a single review otherwise has that
+# review as its baseline.
+MEAN_SHRINKAGE = 5
+
+
+class ReviewerSimilarity:
+    """A sparse reviewer-by-movie score matrix used to compare reviewers with each other.
+
+    Every score is stored relative to the movie's average score, so a value is positive
+    when the reviewer liked a movie more than the other critics did. Similarity between
+    two reviewers is the cosine similarity of these centred score vectors.
+
+    The matrix is stored by column (movie -> the reviewers who reviewed it), so comparing a
+    query against every reviewer only touches the movies in the query, which is a sparse
+    matrix-vector product rather than one comparison per reviewer.
+
+    Instance Attributes:
+        - graph: The review graph this engine was built from.
+
+    Representation Invariants:
+        - all(reviewer in self._norms for reviewer in self._ratings)
+    """
+    # Private Instance Attributes:
+    #     - _movie_means:
+    #         Maps each movie title to the average score it received.
+    #     - _ratings:
+    #         Maps each reviewer to their centred scores (movie title -> centred score).
+    #     - _columns:
+    #         Maps each movie title to a list of (reviewer, centred score) tuples.
+    #     - _norms:
+    #         Maps each reviewer to the length of their centred score vector.
+    #     - _baselines:
+    #         Maps each movie title to its average score shrunk towards the average of every review
+    #         (see MEAN_SHRINKAGE), the baseline of its predicted scores.
+    graph: Graph
+    _movie_means: dict[str, float]
+    _ratings: dict[str, dict[str, float]]
+    _columns: dict[str, list[tuple[str, float]]]
+    _norms: dict[str, float]
+    _baselines: dict[str, float]
+
+    def __init__(self, graph: Graph) -> None:
+        """Build the centred score matrix of every reviewer in the given graph."""
+        self.graph = graph
+        self._movie_means = {}
+        self._ratings = {}
+        self._columns = {}
+        self._norms = {}
+        self._baselines = {}
+
+        for movie in graph.get_all_vertices('movie'):
+            reviewers = graph.get_neighbours(movie)
+            scores = [(reviewer, graph.get_weight(movie, reviewer)) for reviewer in reviewers]
+            mean = sum(score for _, score in scores) / len(scores) if scores else 0.0
+            self._movie_means[movie] = mean
+            self._columns[movie] = [(reviewer, score - mean) for reviewer, score in scores]
+
+            for reviewer, score in scores:
+                self._ratings.setdefault(reviewer, {})[movie] = score - mean
+
+        for reviewer, ratings in self._ratings.items():
+            self._norms[reviewer] = math.sqrt(sum(value * value for value in ratings.values()))
+
+        total = sum(self._movie_means[movie] * len(column) for movie, column in self._columns.items())
+        count = sum(len(column) for column in self._columns.values())
+        overall_mean = total / count if count else 0.0
+        for movie, column in self._columns.items():
+            self._baselines[movie] = ((self._movie_means[movie] * len(column) + overall_mean * MEAN_SHRINKAGE)
+                                      / (len(column) + MEAN_SHRINKAGE))
+
+    def centre_ratings(self, ratings: dict[str, float]) -> dict[str, float]:
+        """Return the given raw movie scores relative to each movie's average score.
+
+        Movies which do not appear in the review graph are ignored.
+        """
+        return {movie: score - self._movie_means[movie] for movie, score in ratings.items()
+                if movie in self._movie_means}
+
+    def similar_to_ratings(self, ratings: dict[str, float], limit: int,
+                           exclude: str = '') -> list[tuple[float, str]]:
+        """Return up to <limit> tuples of (similarity score, reviewer) for the reviewers whose scores
+        best match the given raw movie scores, from highest to lowest similarity.
+
+        The reviewer <exclude> is never returned. Only reviewers with a positive similarity
+        are returned.
+
+        Preconditions:
+            - limit >= 1
+        """
+        query = self.centre_ratings(ratings)
+        query_norm = math.sqrt(sum(value * value for value in query.values()))
+        if query_norm == 0:
+            return []
+
+        # Sparse matrix-vector product: only the columns of the rated movies are visited
+        dot_products = {}
+        overlaps = {}
+        for movie, value in query.items():
+            for reviewer, centred_score in self._columns[movie]:
+                dot_products[reviewer] = dot_products.get(reviewer, 0.0) + value * centred_score
+                overlaps[reviewer] = overlaps.get(reviewer, 0) + 1
+
+        similarities = []
+        for reviewer, dot_product in dot_products.items():
+            if reviewer == exclude or self._norms[reviewer] == 0:
+                continue
+            similarity = dot_product / (query_norm * self._norms[reviewer])
+            similarity *= min(overlaps[reviewer], SHRINKAGE) / SHRINKAGE
+            if similarity > 0:
+                similarities.append((round(similarity, 4), reviewer))
+
+        similarities.sort(reverse=True)
+        return similarities[:limit]
+
+    def similar_reviewers(self, reviewer: str, limit: int) -> list[tuple[float, str]]:
+        """Return up to <limit> tuples of (similarity score, reviewer) for the reviewers whose scores
+        best match the given reviewer's scores, from highest to lowest similarity.
+
+        Raise a ValueError if reviewer does not appear as a reviewer in the review graph.
+
+        Preconditions:
+            - limit >= 1
+        """
+        if reviewer not in self._ratings:
+            raise ValueError
+        return self.similar_to_ratings(self._reviewer_scores(reviewer), limit, reviewer)
+
+    def recommend_from_ratings(self, ratings: dict[str, float], limit: int,
+                               neighbours: int = 50, exclude: str = '') -> list[tuple[float, str, str]]:
+        """Return a list of tuples of up to <limit> recommended movies for someone who gave the
+        given raw movie scores, based on the scores of the <neighbours> most similar reviewers.
+        The tuple will contain the following information: predicted score, movie title, most similar
+        reviewer who reviewed the movie.
+
+        A movie's predicted score is its (shrunk) average score, adjusted by how much more (or less) the
+        similar reviewers liked it than average, weighted by their similarity. The adjustment is
+        shrunk towards 0 when the total similarity of the reviewers who reviewed the movie is low
+        (see PREDICTION_SHRINKAGE).
+        Movies which are already in ratings are never recommended.
+
+        Preconditions:
+            - limit >= 1
+            - neighbours >= 1
+        """
+        # Maps movie to [weighted sum of centred scores, sum of similarities, best reviewer]
+        predictions = {}
+        for similarity, reviewer in self.similar_to_ratings(ratings, neighbours, exclude):
+            for movie, centred_score in self._ratings[reviewer].items():
+                if movie in ratings:
+                    continue
+                if movie not in predictions:
+                    # Neighbours are visited from most to least similar
+                    predictions[movie] = [0.0, 0.0, reviewer]
+                predictions[movie][0] += similarity * centred_score
+                predictions[movie][1] += similarity
+
+        recommendations = []
+        for movie, (weighted_sum, total_similarity, reviewer) in predictions.items():
+            predicted_score = self._baselines[movie] + weighted_sum / (total_similarity + PREDICTION_SHRINKAGE)
+            recommendations.append((round(predicted_score, 2), movie, reviewer))
+
+        recommendations.sort(reverse=True)
+        return recommendations[:limit]
+
+    def recommend_for_reviewer(self, reviewer: str, limit: int,
+                               neighbours: int = 50) -> list[tuple[float, str, str]]:
+        """Return a list of tuples of up to <limit> recommended movies for the given reviewer,
+        based on the scores of the <neighbours> most similar reviewers.
+        The tuples have the same format as in recommend_from_ratings.
+
+        Raise a ValueError if reviewer does not appear as a reviewer in the review graph.
+
+        Preconditions:
+            - limit >= 1
+            - neighbours >= 1
+        """
+        if reviewer not in self._ratings:
+            raise ValueError
+        return self.recommend_from_ratings(self._reviewer_scores(reviewer), limit, neighbours, reviewer)
+
+    def _reviewer_scores(self, reviewer: str) -> dict[str, float]:
+        """Return the raw movie scores of the given reviewer.
+
+        Preconditions:
+            - reviewer in self._ratings
+        """
+        return {movie: centred_score + self._movie_means[movie]
+                for movie, centred_score in self._ratings[reviewer].items()}
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['graph', 'math'],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
@@ -11,6 +11,8 @@ under the MIT License. Please consult LICENSE for further details.
 
 Copyright (c) 2025 Minh Nguyen & Yifan Qiu
 """
+from __future__ import annotations
+from typing import Optional, Union
 
 
 def get_normalized_word_list(text: str) -> list[str]:
@@ -26,16 +28,104 @@ def get_normalized_word_list(text: str) -> list[str]:
     word_list = text.lower().split()
 
     for i in range(len(word_list)):
-        word = "".join([letter for letter in word_list[i] if letter.isalpha()])
-        word_list[i] = word
+        # Most words have no punctuation, and are already normalized
+        if not word_list[i].isalpha():
+            word_list[i] = "".join([letter for letter in word_list[i] if letter.isalpha()])
 
     return word_list
 
 
-def get_sentiment_review_score(review: str, sentiment_scores: dict[str, tuple[float, float]]) -> float:
-    """Return the sentiment sscore for the provided review.
+class SentimentMatcher:
+    """A sentiment lexicon compiled into a trie over words, which finds the single words and multi-word
+    phrases of the lexicon in a list of words in one pass.
+
+    Multi-word phrases are stored in the lexicon with underscores between their words (e.g. 'ice_cream').
+    The lexicon in data/sentiment_scores.txt has no such phrases, so with it every match is a single word,
+    and the scores are the same as with the lexicon dictionary. A lexicon without phrases is not compiled
+    into a trie at all: its words are looked up in the lexicon dictionary directly, which is faster.
+
+    Matches do not overlap: at each word, the longest lexicon entry starting there is matched, and the
+    words it covers are skipped, so a phrase's score is not diluted by the scores of its own words.
+
+    >>> matcher = SentimentMatcher({'ice': (0.0, 0.0), 'ice_cream': (0.5, 0.0), 'cream': (0.25, 0.0)})
+    >>> matcher.match(['i', 'like', 'ice', 'cream'])
+    (0.5, 0.0, 1)
+    >>> matcher.match(['ice', 'and', 'cream'])
+    (0.25, 0.0, 2)
+    """
+    # Private Instance Attributes:
+    #     - _goto:
+    #         The transitions of each state of the trie. Maps a word to the next state.
+    #     - _entries:
+    #         The (positive score, negative score) of the lexicon entry ending at each state,
+    #         or None if no entry ends there.
+    #     - _words:
+    #         The lexicon itself if it has no multi-word phrases (and so no trie is needed), or None otherwise.
+    _goto: list[dict[str, int]]
+    _entries: list[Optional[tuple[float, float]]]
+    _words: Optional[dict[str, tuple[float, float]]]
+
+    def __init__(self, sentiment_scores: dict[str, tuple[float, float]]) -> None:
+        """Compile the given lexicon (as returned by build_sentiment_score_dict) into a trie."""
+        self._goto = [{}]
+        self._entries = [None]
+        self._words = None
+
+        if not any('_' in phrase for phrase in sentiment_scores):
+            self._words = sentiment_scores
+            return
+
+        for phrase, scores in sentiment_scores.items():
+            state = 0
+            for word in phrase.split('_'):
+                if word not in self._goto[state]:
+                    self._goto[state][word] = len(self._goto)
+                    self._goto.append({})
+                    self._entries.append(None)
+                state = self._goto[state][word]
+            self._entries[state] = scores
+
+    def match(self, word_list: list[str]) -> tuple[float, float, int]:
+        """Return the total positive score, total negative score and number of matches of the
+        (longest, non-overlapping) lexicon entries in the given list of words.
+        """
+        if self._words is not None:
+            return _match_words(word_list, self._words)
+
+        goto, entries, root = self._goto, self._entries, self._goto[0]
+        pos_score, neg_score, sen_keywords = 0, 0, 0
+
+        i = 0
+        while i < len(word_list):
+            if word_list[i] not in root:
+                i += 1
+                continue
+
+            # Follow the trie for as long as the words continue an entry, remembering the longest match
+            state = root[word_list[i]]
+            longest, longest_end = entries[state], i + 1
+            j = i + 1
+            while goto[state] and j < len(word_list) and word_list[j] in goto[state]:
+                state = goto[state][word_list[j]]
+                j += 1
+                if entries[state] is not None:
+                    longest, longest_end = entries[state], j
+
+            if longest is None:
+                i += 1
+            else:
+                sen_keywords += 1
+                pos_score += longest[0]
+                neg_score += longest[1]
+                i = longest_end
+
+        return pos_score, neg_score, sen_keywords
+
+
+def _match_words(word_list: list[str], sentiment_scores: dict[str, tuple[float, float]]) -> tuple[float, float, int]:
+    """Return the total positive score, total negative score and number of matches of the single-word
+    lexicon entries in the given list of words.
     """
-    word_list = get_normalized_word_list(review)
     pos_score, neg_score, sen_keywords = 0, 0, 0
 
     for word in word_list:
@@ -44,6 +134,23 @@ def get_sentiment_review_score(review: str, sentiment_scores: dict[str, tuple[fl
             pos_score += sentiment_scores[word][0]
             neg_score += sentiment_scores[word][1]
 
+    return pos_score, neg_score, sen_keywords
+
+
+def get_sentiment_review_score(review: str,
+                               sentiment_scores: Union[dict[str, tuple[float, float]], SentimentMatcher]) -> float:
+    """Return the sentiment sscore for the provided review.
+
+    If sentiment_scores is a SentimentMatcher, multi-word phrases of the lexicon are matched as well as
+    single words.
+    """
+    word_list = get_normalized_word_list(review)
+
+    if isinstance(sentiment_scores, SentimentMatcher):
+        pos_score, neg_score, sen_keywords = sentiment_scores.match(word_list)
+    else:
+        pos_score, neg_score, sen_keywords = _match_words(word_list, sentiment_scores)
+
     # If there are no sentiment keywords, assume that the review is neutral
     # This will also apply to reviews in non-English languages
     if sen_keywords < 1:
@@ -0,0 +1,388 @@
+"""CSC111 Project 2: FilmRecommandeur - Shared Graph
+
+This Python module contains a read-only, frozen version of the review graph stored in shared memory,
+and a pool of worker processes which answer recommendation queries from that single copy.
+
+Copyright and Usage Information
+===============================
+This file (and other respective files associated with this project) is licensed
+under the MIT License. Please consult LICENSE for further details.
+
+Copyright (c) 2025 Minh Nguyen & Yifan Qiu
+"""
+from __future__ import annotations
+from array import array
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Any, Optional
+import heapq
+import multiprocessing
+import os
+import sys
+import time
+
+from graph import DEADLINE_CHECK_EDGES, Graph, RecommendationResult
+
+# The array type codes of the frozen graph's arrays, in the order they are stored in shared memory
+ARRAY_TYPES = {
+    'string_offsets': 'q',  # The start of each item in the string table (plus the end of the last one)
+    'kinds': 'b',  # 1 for movie vertices, 0 for other vertices
+    'offsets': 'q',  # The start of each vertex's edges in the edge arrays (plus the end of the last one)
+    'neighbours': 'i',  # The id of the other vertex of each edge
+    'scores': 'd',  # The score of each edge
+    'advanced': 'd',  # The advanced weight of each edge
+}
+
+
+class FrozenGraph:
+    """A read-only review graph stored as flat arrays in one shared memory block.
+
+    Vertex ids are the positions of the vertex items in sorted order. The items are stored in a string
+    table (UTF-8 encoded), and the edges of each vertex are stored contiguously in the edge arrays
+    (compressed sparse row format). Looking up an item is a binary search in the string table, so
+    queries never create per-vertex Python objects that would be copied into a worker process.
+
+    Instance Attributes:
+        - num_vertices: The number of vertices in this graph.
+    """
+    # Private Instance Attributes:
+    #     - _memory:
+    #         The shared memory block holding the arrays and the string table.
+    #     - _layout:
+    #         Maps each array name (and 'strings') to its (start, end) in the shared memory block.
+    #     - _arrays:
+    #         Maps each array name in ARRAY_TYPES to a typed view of the array in the shared memory block.
+    #     - _strings:
+    #         A view of the string table in the shared memory block.
+    num_vertices: int
+    _memory: shared_memory.SharedMemory
+    _layout: dict[str, tuple[int, int]]
+    _arrays: dict[str, memoryview]
+    _strings: memoryview
+
+    def __init__(self, memory: shared_memory.SharedMemory, layout: dict[str, tuple[int, int]]) -> None:
+        """Initialize a frozen graph from a shared memory block with the given layout (see freeze_graph)."""
+        self._memory = memory
+        self._layout = layout
+        self._arrays = {name: memory.buf[start:end].cast(ARRAY_TYPES[name])
+                        for name, (start, end) in layout.items() if name in ARRAY_TYPES}
+        start, end = layout['strings']
+        self._strings = memory.buf[start:end]
+        self.num_vertices = len(self._arrays['kinds'])
+
+    def __getstate__(self) -> dict:
+        """Return the state of this graph for pickling, i.e. the name and layout of its shared memory block.
+
+        Only processes on the same machine can unpickle it, by attaching to the shared memory block.
+        """
+        return {'name': self._memory.name, 'layout': self._layout}
+
+    def __setstate__(self, state: dict) -> None:
+        """Attach to the shared memory block of a state returned by __getstate__."""
+        self.__init__(shared_memory.SharedMemory(name=state['name']), state['layout'])
+
+    def close(self, unlink: bool = False) -> None:
+        """Release this process's views of the shared memory block, and free the block if unlink is True."""
+        for view in self._arrays.values():
+            view.release()
+        self._strings.release()
+        self._arrays = {}
+        self._memory.close()
+        if unlink:
+            self._memory.unlink()
+
+    def item(self, vertex_id: int) -> str:
+        """Return the item of the vertex with the given id."""
+        string_offsets = self._arrays['string_offsets']
+        return bytes(self._strings[string_offsets[vertex_id]:string_offsets[vertex_id + 1]]).decode('utf-8')
+
+    def find(self, item: str) -> int:
+        """Return the id of the vertex with the given item.
+
+        Raise a ValueError if there is no vertex with the given item.
+        """
+        target = item.encode('utf-8')
+        string_offsets = self._arrays['string_offsets']
+        low, high = 0, self.num_vertices
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(self._strings[string_offsets[middle]:string_offsets[middle + 1]]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.num_vertices and self.item(low) == item:
+            return low
+        raise ValueError
+
+    def recommend_movie(self, movie: str, limit: int, score_type: str = 'unweighted',
+                        restriction: int = 5) -> list[tuple[float, str, str]]:
+        """Return a list of tuples of up to <limit> recommended movies based on similarity to the given movie,
+        as in graph.Graph.recommend_movie.
+
+        Raise a ValueError if movie is not a movie in this graph.
+
+        Preconditions:
+            - limit >= 1
+            - score_type in {'unweighted' , 'weighted', 'advanced_weighted'}
+            - restriction >= 0
+        """
+        return self.recommend_movie_anytime(movie, limit, score_type, restriction).recommendations
+
+    def recommend_movie_anytime(self, movie: str, limit: int, score_type: str = 'unweighted',
+                                restriction: int = 5, budget_ms: Optional[float] = None) -> RecommendationResult:
+        """Return up to <limit> recommended movies based on similarity to the given movie, computed within
+        budget_ms milliseconds, as in graph.Graph.recommend_movie_anytime.
+
+        The deadline is checked every DEADLINE_CHECK_EDGES edges, including in the middle of a reviewer's
+        edges. Unlike graph.Graph, a frozen graph does not keep unfinished scans to be resumed.
+
+        Raise a ValueError if movie is not a movie in this graph.
+
+        Preconditions:
+            - limit >= 1
+            - score_type in {'unweighted' , 'weighted', 'advanced_weighted'}
+            - restriction >= 0
+            - budget_ms is None or budget_ms >= 0
+        """
+        deadline = None if budget_ms is None else time.perf_counter() + budget_ms / 1000
+        offsets, neighbours = self._arrays['offsets'], self._arrays['neighbours']
+        weights = self._arrays['advanced'] if score_type == 'advanced_weighted' else self._arrays['scores']
+
+        seed = self.find(movie)
+        if not self._arrays['kinds'][seed]:
+            raise ValueError
+        seed_edges = range(offsets[seed], offsets[seed + 1])
+        reviewers = sorted(seed_edges, key=lambda edge: offsets[neighbours[edge] + 1] - offsets[neighbours[edge]])
+        total_work = sum(offsets[neighbours[edge] + 1] - offsets[neighbours[edge]] for edge in reviewers)
+
+        # Maps each candidate movie id to [shared reviewers, shared reviewers within restriction]
+        shared = {}
+        work_done, complete = 0, True
+        for edge in reviewers:
+            reviewer, seed_weight = neighbours[edge], weights[edge]
+            for other_edge in range(offsets[reviewer], offsets[reviewer + 1]):
+                if work_done % DEADLINE_CHECK_EDGES == 0 and deadline is not None \
+                        and time.perf_counter() > deadline:
+                    complete = False
+                    break
+                work_done += 1
+                other = neighbours[other_edge]
+                if other != seed:
+                    counts = shared.setdefault(other, [0, 0])
+                    counts[0] += 1
+                    if score_type == 'unweighted' or abs(seed_weight - weights[other_edge]) <= restriction:
+                        counts[1] += 1
+            if not complete:
+                break
+
+        # Vertex ids are in the same order as their items, so ties are broken the same way as
+        # graph.Graph.recommend_movie, and only the returned items need to be decoded
+        ratings = []
+        seed_degree = len(seed_edges)
+        for other, (shared_count, shared_restrict) in shared.items():
+            union = seed_degree + offsets[other + 1] - offsets[other] - shared_count
+            similarity_score = shared_restrict / union
+            if similarity_score > 0.0:
+                ratings.append((round(similarity_score * 1000, 2), other))
+
+        recommendations = [(score, self.item(other), movie) for score, other in heapq.nlargest(limit, ratings)]
+        coverage = 1.0 if complete else work_done / total_work
+        return RecommendationResult(recommendations, complete, coverage)
+
+
+def freeze_graph(graph: Graph) -> FrozenGraph:
+    """Return a frozen copy of the given review graph, stored in a new shared memory block.
+
+    The caller is responsible for freeing the block with FrozenGraph.close(unlink=True).
+    """
+    graph.resolve_sentiment()
+    items = sorted(graph.get_all_vertices(), key=lambda item: item.encode('utf-8'))
+    ids = {item: i for i, item in enumerate(items)}
+    movies = graph.get_all_vertices('movie')
+
+    arrays = {name: array(type_code) for name, type_code in ARRAY_TYPES.items()}
+    strings = bytearray()
+    arrays['offsets'].append(0)
+    arrays['string_offsets'].append(0)
+    for item in items:
+        strings += item.encode('utf-8')
+        arrays['string_offsets'].append(len(strings))
+        arrays['kinds'].append(1 if item in movies else 0)
+        for neighbour in sorted(graph.get_neighbours(item), key=ids.__getitem__):
+            arrays['neighbours'].append(ids[neighbour])
+            arrays['scores'].append(graph.get_weight(item, neighbour))
+            arrays['advanced'].append(graph.get_weight(item, neighbour, True))
+        arrays['offsets'].append(len(arrays['neighbours']))
+
+    # Lay the arrays out one after the other, each aligned to 8 bytes
+    layout, size = {}, 0
+    for name, data in list(arrays.items()) + [('strings', strings)]:
+        length = len(data) * (data.itemsize if isinstance(data, array) else 1)
+        layout[name] = (size, size + length)
+        size += length + (-length % 8)
+
+    memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for name, data in list(arrays.items()) + [('strings', strings)]:
+        start, end = layout[name]
+        memory.buf[start:end] = data.tobytes() if isinstance(data, array) else bytes(data)
+    return FrozenGraph(memory, layout)
+
+
+class WorkerPool:
+    """A pool of worker processes, forked after the graph is frozen, which answer recommendation
+    queries from the one shared copy of the graph.
+
+    The original Graph should be deleted before the pool is created: the workers are forked, and would
+    otherwise slowly copy its pages as they touch the reference counts of its objects.
+
+    Instance Attributes:
+        - graph: The frozen graph shared by the workers.
+    """
+    # Private Instance Attributes:
+    #     - _workers:
+    #         The worker processes, with the connection used to send them queries.
+    #     - _next_worker:
+    #         The index of the worker that receives the next single query.
+    graph: FrozenGraph
+    _workers: list[tuple[multiprocessing.Process, Connection]]
+    _next_worker: int
+
+    def __init__(self, graph: FrozenGraph, num_workers: int) -> None:
+        """Fork num_workers worker processes which answer queries on the given frozen graph.
+
+        Preconditions:
+            - num_workers >= 1
+        """
+        self.graph = graph
+        self._workers = []
+        self._next_worker = 0
+        context = multiprocessing.get_context('fork')
+        for _ in range(num_workers):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(target=_worker_loop, args=(graph, worker_connection), daemon=True)
+            process.start()
+            worker_connection.close()
+            self._workers.append((process, connection))
+
+    def recommend_movie(self, movie: str, limit: int, score_type: str = 'unweighted',
+                        restriction: int = 5, budget_ms: Optional[float] = None) -> RecommendationResult:
+        """Return the result of FrozenGraph.recommend_movie_anytime for the given query, computed by
+        the next worker.
+
+        An exception raised by the worker (e.g. the ValueError for an unknown movie) is raised again here.
+        """
+        _, connection = self._workers[self._next_worker]
+        self._next_worker = (self._next_worker + 1) % len(self._workers)
+        connection.send(('recommend', (movie, limit, score_type, restriction, budget_ms)))
+        return _receive(connection)
+
+    def recommend_movies(self, queries: list[tuple]) -> list[RecommendationResult]:
+        """Return the results of FrozenGraph.recommend_movie_anytime for each of the given queries
+        (tuples of its arguments), computed by the workers in parallel.
+
+        The first exception raised by a worker is raised again here, once every worker has answered.
+        """
+        results = []
+        for start in range(0, len(queries), len(self._workers)):
+            batch = queries[start:start + len(self._workers)]
+            for (_, connection), query in zip(self._workers, batch):
+                connection.send(('recommend', tuple(query)))
+            results.extend(connection.recv() for (_, connection), _ in zip(self._workers, batch))
+
+        for error, _ in results:
+            if error is not None:
+                raise error
+        return [result for _, result in results]
+
+    def memory_report(self) -> dict[int, dict[str, int]]:
+        """Return a dictionary mapping the process id of this process and each worker to its memory use.
+
+        Each memory use maps 'rss' to the resident memory (in bytes), and 'private' to the memory not
+        shared with any other process (in bytes), i.e. the worker's overhead over the shared graph.
+
+        The report is only accurate on Linux. On other systems, see _memory_usage.
+        """
+        report = {os.getpid(): _memory_usage()}
+        for process, connection in self._workers:
+            connection.send(('memory', ()))
+            report[process.pid] = _receive(connection)
+        return report
+
+    def close(self) -> None:
+        """Stop the workers and free the shared graph."""
+        for process, connection in self._workers:
+            connection.send(('stop', ()))
+            process.join()
+            connection.close()
+        self._workers = []
+        self.graph.close(unlink=True)
+
+
+def _worker_loop(graph: FrozenGraph, connection: Connection) -> None:
+    """Answer the queries received from connection on the given frozen graph, until told to stop.
+
+    Each answer is a tuple of (None, result), or (exception, None) if the query raised an exception,
+    so that a bad query does not stop the worker.
+    """
+    while True:
+        command, arguments = connection.recv()
+        if command == 'stop':
+            break
+        try:
+            if command == 'memory':
+                result = _memory_usage()
+            else:
+                result = graph.recommend_movie_anytime(*arguments)
+        except Exception as error:
+            connection.send((error, None))
+        else:
+            connection.send((None, result))
+    connection.close()
+
+
+def _receive(connection: Connection) -> Any:
+    """Return the result of a worker's answer received from connection, or raise its exception."""
+    error, result = connection.recv()
+    if error is not None:
+        raise error
+    return result
+
+
+def _memory_usage() -> dict[str, int]:
+    """Return the resident and private memory (in bytes) of this process, as in WorkerPool.memory_report.
+
+    Both are only available on Linux (from /proc). On other Unix systems, both are reported as the peak
+    resident memory of the process so far, which ru_maxrss gives in bytes on macOS and in KiB elsewhere.
+    On systems without the resource module (e.g. Windows), both are reported as 0.
+    """
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    usage[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except OSError:
+        try:
+            import resource
+        except ImportError:
+            return {'rss': 0, 'private': 0}
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != 'darwin':
+            peak_rss *= 1024
+        return {'rss': peak_rss, 'private': peak_rss}
+    return {'rss': usage.get('Rss', 0),
+            'private': usage.get('Private_Clean', 0) + usage.get('Private_Dirty', 0)}
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['array', 'heapq', 'multiprocessing', 'multiprocessing.shared_memory',
+                          'multiprocessing.connection', 'os', 'resource', 'sys', 'time', 'graph'],
+        'allowed-io': ['_memory_usage'],
+        'max-line-length': 120
+    })
@@ -0,0 +1,432 @@
+"""CSC111 Project 2: FilmRecommandeur - SQLite Graph
+
+This Python module contains a disk-resident version of the review graph, stored in an indexed
+SQLite file, for datasets which do not fit in memory.
+
+Copyright and Usage Information
+===============================
+This file (and other respective files associated with this project) is licensed
+under the MIT License. Please consult LICENSE for further details.
+
+Copyright (c) 2025 Minh Nguyen & Yifan Qiu
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional, Union
+import sqlite3
+import time
+
+import networkx as nx
+
+from graph import DEADLINE_CHECK_EDGES, MAX_VERTICES, RecommendationResult
+
+# The maximum size of SQLite's page cache, in KiB
+CACHE_SIZE = 64 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vertices (
+    id INTEGER PRIMARY KEY,
+    item TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    degree INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS vertices_by_kind ON vertices (kind);
+CREATE TABLE IF NOT EXISTS edges (
+    movie INTEGER NOT NULL REFERENCES vertices (id),
+    reviewer INTEGER NOT NULL REFERENCES vertices (id),
+    score REAL NOT NULL,
+    sentiment REAL NOT NULL,
+    advanced REAL NOT NULL,
+    date INTEGER NOT NULL DEFAULT 0,
+    publisher TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (movie, reviewer)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edges_by_reviewer ON edges (reviewer, movie, score, advanced);
+"""
+
+# The two-hop walk from a movie to every movie sharing a reviewer with it. The seed's edges are read
+# from the primary key, and the other movies' edges from the covering reviewer index, so the walk
+# never reads the edges table itself for the other movies. {counts} is one or more RESTRICTION_COUNT
+# columns, separated by commas.
+TWO_HOP_QUERY = """
+SELECT other.item, other.degree, COUNT(*), {counts}
+FROM edges AS seed
+JOIN edges AS shared ON shared.reviewer = seed.reviewer AND shared.movie != seed.movie
+JOIN vertices AS other ON other.id = shared.movie
+WHERE seed.movie = ?
+GROUP BY shared.movie
+"""
+
+# The number of shared reviewers whose scores (in the given column) differ by at most a restriction
+RESTRICTION_COUNT = 'SUM(ABS(seed.{column} - shared.{column}) <= ?)'
+
+
+class SQLiteGraph:
+    """A (weighted) review graph stored in an SQLite file.
+
+    This has the same methods as graph.Graph, but only keeps SQLite's (bounded) page cache in memory.
+    Edges are stored from the movie to the reviewer, along with the score, sentiment score,
+    advanced weight, review date and publisher of the review.
+
+    Instance Attributes:
+        - database_file: The path of the SQLite file.
+    """
+    # Private Instance Attributes:
+    #     - _connection:
+    #         The connection to the SQLite file.
+    #     - _bulk_loading:
+    #         Whether a bulk load transaction is in progress.
+    database_file: str
+    _connection: sqlite3.Connection
+    _bulk_loading: bool
+
+    def __init__(self, database_file: str) -> None:
+        """Initialize a graph stored in database_file, which is created if it does not exist."""
+        self.database_file = database_file
+        self._connection = sqlite3.connect(database_file, isolation_level=None)
+        self._connection.execute(f'PRAGMA cache_size = -{CACHE_SIZE}')
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.executescript(SCHEMA)
+        self._bulk_loading = False
+
+    def close(self) -> None:
+        """Close the connection to the SQLite file."""
+        self._connection.close()
+
+    @contextmanager
+    def bulk_load(self) -> Iterator[None]:
+        """Add every vertex and edge within this context in a single transaction.
+
+        The vertex degrees are recomputed once at the end, rather than after every edge.
+        """
+        self._connection.execute('BEGIN')
+        self._bulk_loading = True
+        try:
+            yield
+            self._connection.execute("""
+                UPDATE vertices SET degree = (SELECT COUNT(*) FROM edges WHERE movie = vertices.id)
+                                           + (SELECT COUNT(*) FROM edges WHERE reviewer = vertices.id)
+            """)
+            self._connection.execute('COMMIT')
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+        finally:
+            self._bulk_loading = False
+
+    def clear(self) -> None:
+        """Remove every vertex and edge from this graph."""
+        self._connection.execute('DELETE FROM edges')
+        self._connection.execute('DELETE FROM vertices')
+
+    def add_vertex(self, item: Any, kind: str) -> None:
+        """Add a vertex with the given item to this graph.
+
+        The new vertex is not adjacent to any other vertices.
+
+        Preconditions:
+            - item is not a vertex in this graph
+        """
+        self._connection.execute('INSERT OR IGNORE INTO vertices (item, kind) VALUES (?, ?)', (item, kind))
+
+    def add_edge(self, item1: Any, item2: Any, weight: list[float]) -> None:
+        """Add an edge between the two vertices with the given items in this graph,
+        with the given weight.
+
+        The weight is a list of [score, sentiment score], optionally followed by the review date
+        (an ordinal as returned by datetime.date.toordinal) and the publisher.
+
+        Raise a ValueError if item1 or item2 do not appear as vertices in this graph.
+
+        Preconditions:
+            - item1 != item2
+        """
+        v1, v2 = self._find_vertex(item1), self._find_vertex(item2)
+        if v1 is None or v2 is None:
+            raise ValueError
+
+        # Store the edge from the movie to the reviewer
+        if v1[1] != 'movie' and v2[1] == 'movie':
+            v1, v2 = v2, v1
+        score, sentiment_score = weight[0], weight[1]
+        date = weight[2] if len(weight) > 2 else 0
+        publisher = weight[3] if len(weight) > 3 else ''
+        advanced_weight = round(score + (score * sentiment_score), 1)
+
+        is_new = self._bulk_loading or self._connection.execute(
+            'SELECT 1 FROM edges WHERE movie = ? AND reviewer = ?', (v1[0], v2[0])).fetchone() is None
+        self._connection.execute("""
+            INSERT INTO edges (movie, reviewer, score, sentiment, advanced, date, publisher)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (movie, reviewer) DO UPDATE SET score = excluded.score, sentiment = excluded.sentiment,
+                advanced = excluded.advanced, date = excluded.date, publisher = excluded.publisher
+        """, (v1[0], v2[0], score, sentiment_score, advanced_weight, date, publisher))
+
+        if is_new and not self._bulk_loading:
+            self._connection.execute('UPDATE vertices SET degree = degree + 1 WHERE id IN (?, ?)', (v1[0], v2[0]))
+
+    def adjacent(self, item1: Any, item2: Any) -> bool:
+        """Return whether item1 and item2 are adjacent vertices in this graph.
+
+        Return False if item1 or item2 do not appear as vertices in this graph.
+        """
+        return self._find_edge(item1, item2) is not None
+
+    def get_neighbours(self, item: Any) -> set:
+        """Return a set of the neighbours of the given item.
+
+        Raise a ValueError if item does not appear as a vertex in this graph.
+        """
+        vertex = self._find_vertex(item)
+        if vertex is None:
+            raise ValueError
+        rows = self._connection.execute("""
+            SELECT item FROM edges JOIN vertices ON id = reviewer WHERE movie = ?
+            UNION ALL
+            SELECT item FROM edges JOIN vertices ON id = movie WHERE reviewer = ?
+        """, (vertex[0], vertex[0]))
+        return {row[0] for row in rows}
+
+    def get_all_vertices(self, kind: str = '') -> set:
+        """Return a set of all vertex items in this graph.
+
+        If kind != '', only return the items of the given vertex kind.
+
+        Preconditions:
+            - kind in {'', 'user', 'movie'}
+        """
+        if kind != '':
+            rows = self._connection.execute('SELECT item FROM vertices WHERE kind = ?', (kind,))
+        else:
+            rows = self._connection.execute('SELECT item FROM vertices')
+        return {row[0] for row in rows}
+
+    def count_edges(self) -> int:
+        """Return the number of edges in this graph."""
+        return self._connection.execute('SELECT COUNT(*) FROM edges').fetchone()[0]
+
+    def get_weight(self, item1: Any, item2: Any, advanced: bool = False) -> Union[int, float]:
+        """Return the weight of the edge between the given items.
+
+        Return 0 if item1 and item2 are not adjacent.
+
+        Preconditions:
+            - item1 and item2 are vertices in this graph
+        """
+        edge = self._find_edge(item1, item2)
+        if edge is None:
+            return 0
+        return edge[1] if advanced else edge[0]
+
+    def average_weight(self, item: Any) -> float:
+        """Return the average weight of the edges adjacent to the vertex corresponding to item.
+
+        Raise ValueError if item does not corresponding to a vertex in the graph.
+        """
+        vertex = self._find_vertex(item)
+        if vertex is None:
+            raise ValueError
+        return self._connection.execute('SELECT AVG(score) FROM edges WHERE movie = ? OR reviewer = ?',
+                                        (vertex[0], vertex[0])).fetchone()[0]
+
+    def to_networkx(self, max_vertices: int = MAX_VERTICES, advanced: bool = False) -> nx.Graph:
+        """Convert this graph into a networkx graph, with the first max_vertices vertices that were added
+        and the edges between them.
+
+        Preconditions:
+            - max_vertices > 0
+        """
+        graph_nx = nx.Graph()
+        last_id = 0
+        for vertex_id, item, kind in self._connection.execute('SELECT id, item, kind FROM vertices ORDER BY id LIMIT ?',
+                                                              (max_vertices,)):
+            graph_nx.add_node(item, kind=kind)
+            last_id = vertex_id
+
+        for movie, reviewer, score, sentiment, advanced_weight in self._connection.execute("""
+            SELECT m.item, r.item, score, sentiment, advanced FROM edges
+            JOIN vertices AS m ON m.id = movie JOIN vertices AS r ON r.id = reviewer
+            WHERE movie <= ? AND reviewer <= ?
+        """, (last_id, last_id)):
+            if advanced:
+                graph_nx.add_edge(movie, reviewer, score=score, sentiment=sentiment, advanced_weight=advanced_weight)
+            else:
+                graph_nx.add_edge(movie, reviewer, score=score, sentiment=sentiment)
+        return graph_nx
+
+    def get_similarity_score(self, item1: Any, item2: Any,
+                             score_type: str = 'unweighted', restriction: int = 5) -> float:
+        """Return the similarity score between the two given items in this graph,
+        as in graph.Graph.get_similarity_score.
+
+        Raise a ValueError if item1 or item2 do not appear as vertices in this graph.
+
+        Preconditions:
+            - score_type in {'unweighted', 'weighted', 'advanced_weighted'}
+            - restriction >= 0
+        """
+        v1, v2 = self._find_vertex(item1), self._find_vertex(item2)
+        if v1 is None or v2 is None:
+            raise ValueError
+        if v1[2] == 0 or v2[2] == 0:
+            return 0
+
+        column = 'advanced' if score_type == 'advanced_weighted' else 'score'
+        shared, shared_restrict = self._connection.execute(f"""
+            SELECT COUNT(*), SUM(ABS(e1.{column} - e2.{column}) <= ?)
+            FROM edges AS e1 JOIN edges AS e2 ON e2.reviewer = e1.reviewer
+            WHERE e1.movie = ? AND e2.movie = ?
+        """, (restriction, v1[0], v2[0])).fetchone()
+        union = v1[2] + v2[2] - shared
+        if score_type == 'unweighted':
+            return shared / union
+        else:
+            return (shared_restrict or 0) / union
+
+    def recommend_movie(self, movie: str, limit: int,
+                        score_type: str = 'unweighted', restriction: int = 5) -> list[tuple[float, str, str]]:
+        """Return a list of tuples of up to <limit> recommended movies based on similarity to the given movie,
+        as in graph.Graph.recommend_movie.
+
+        The shared reviewers of every candidate movie are counted by SQLite in a single two-hop query.
+
+        Preconditions:
+            - movie is a movie vertex in this graph
+            - limit >= 1
+            - score_type in {'unweighted' , 'weighted', 'advanced_weighted'}
+            - restriction >= 0
+        """
+        seed = self._find_vertex(movie)
+        column = 'advanced' if score_type == 'advanced_weighted' else 'score'
+
+        ratings = []
+        for other, degree, shared, shared_restrict in self._connection.execute(
+                TWO_HOP_QUERY.format(counts=RESTRICTION_COUNT.format(column=column)), (restriction, seed[0])):
+            union = seed[2] + degree - shared
+            similarity_score = shared / union if score_type == 'unweighted' else shared_restrict / union
+            if similarity_score > 0.0:
+                ratings.append((round(similarity_score * 1000, 2), other, movie))
+
+        ratings.sort(reverse=True)
+        return ratings[:limit]
+
+    def recommend_movie_anytime(self, movie: str, limit: int, score_type: str = 'unweighted',
+                                restriction: int = 5, budget_ms: Optional[float] = None) -> RecommendationResult:
+        """Return up to <limit> recommended movies based on similarity to the given movie, computed within
+        budget_ms milliseconds, as in graph.Graph.recommend_movie_anytime.
+
+        The two-hop walk is split into one query per reviewer of the given movie, and the deadline is
+        checked every DEADLINE_CHECK_EDGES edges, including in the middle of a reviewer's edges.
+
+        Preconditions:
+            - movie is a movie vertex in this graph
+            - limit >= 1
+            - score_type in {'unweighted' , 'weighted', 'advanced_weighted'}
+            - restriction >= 0
+            - budget_ms is None or budget_ms >= 0
+        """
+        deadline = None if budget_ms is None else time.perf_counter() + budget_ms / 1000
+        seed = self._find_vertex(movie)
+        column = 'advanced' if score_type == 'advanced_weighted' else 'score'
+        reviewers = self._connection.execute(f"""
+            SELECT reviewer, {column}, degree FROM edges JOIN vertices ON id = reviewer
+            WHERE movie = ? ORDER BY degree
+        """, (seed[0],)).fetchall()
+        total_work = sum(degree for _, _, degree in reviewers)
+
+        # Maps each candidate movie to [degree, shared reviewers, shared reviewers within restriction]
+        shared = {}
+        work_done, complete = 0, True
+        for reviewer, seed_weight, _ in reviewers:
+            for other, other_degree, other_weight in self._connection.execute(f"""
+                SELECT item, degree, {column} FROM edges JOIN vertices ON id = movie
+                WHERE reviewer = ?
+            """, (reviewer,)):
+                if work_done % DEADLINE_CHECK_EDGES == 0 and deadline is not None \
+                        and time.perf_counter() > deadline:
+                    complete = False
+                    break
+                work_done += 1
+                if other != movie:
+                    counts = shared.setdefault(other, [other_degree, 0, 0])
+                    counts[1] += 1
+                    if score_type == 'unweighted' or abs(seed_weight - other_weight) <= restriction:
+                        counts[2] += 1
+            if not complete:
+                break
+
+        ratings = []
+        for other, (degree, shared_count, shared_restrict) in shared.items():
+            similarity_score = shared_restrict / (seed[2] + degree - shared_count)
+            if similarity_score > 0.0:
+                ratings.append((round(similarity_score * 1000, 2), other, movie))
+
+        ratings.sort(reverse=True)
+        coverage = 1.0 if complete else work_done / total_work
+        return RecommendationResult(ratings[:limit], complete, coverage)
+
+    def compare_recommendations(self, movie: str, limit: int, restrictions: Iterable[int] = (5,)) \
+            -> dict[tuple[str, int], list[tuple[float, str, str]]]:
+        """Return a dictionary mapping (score_type, restriction) to the recommendations of recommend_movie
+        for the given movie, for every score type and every one of the given restrictions,
+        as in graph.Graph.compare_recommendations.
+
+        Every score type and restriction is counted by SQLite in the same two-hop query.
+
+        Preconditions:
+            - movie is a movie vertex in this graph
+            - limit >= 1
+            - all(restriction >= 0 for restriction in restrictions)
+        """
+        seed = self._find_vertex(movie)
+        # Each restriction is only counted once, even if given more than once
+        restrictions = list(dict.fromkeys(restrictions))
+        if not restrictions:
+            return {}
+        counts = ', '.join(RESTRICTION_COUNT.format(column=column)
+                           for column in ('score', 'advanced') for _ in restrictions)
+        query = TWO_HOP_QUERY.format(counts=counts)
+
+        all_ratings = {(score_type, restriction): [] for score_type in ('unweighted', 'weighted', 'advanced_weighted')
+                       for restriction in restrictions}
+        for other, degree, shared, *shared_restrict in self._connection.execute(
+                query, restrictions + restrictions + [seed[0]]):
+            union = seed[2] + degree - shared
+            for i, restriction in enumerate(restrictions):
+                for score_type, count in (('unweighted', shared), ('weighted', shared_restrict[i]),
+                                          ('advanced_weighted', shared_restrict[len(restrictions) + i])):
+                    if count > 0:
+                        all_ratings[(score_type, restriction)].append((round(count / union * 1000, 2), other, movie))
+
+        for ratings in all_ratings.values():
+            ratings.sort(reverse=True)
+            del ratings[limit:]
+        return all_ratings
+
+    def _find_vertex(self, item: Any) -> Union[tuple[int, str, int], None]:
+        """Return the (id, kind, degree) of the vertex with the given item, or None if there is none."""
+        return self._connection.execute('SELECT id, kind, degree FROM vertices WHERE item = ?', (item,)).fetchone()
+
+    def _find_edge(self, item1: Any, item2: Any) -> Union[tuple[float, float], None]:
+        """Return the (score, advanced weight) of the edge between the given items, or None if they are
+        not adjacent (or not in this graph).
+        """
+        v1, v2 = self._find_vertex(item1), self._find_vertex(item2)
+        if v1 is None or v2 is None:
+            return None
+        return self._connection.execute("""
+            SELECT score, advanced FROM edges
+            WHERE (movie = ? AND reviewer = ?) OR (movie = ? AND reviewer = ?)
+        """, (v1[0], v2[0], v2[0], v1[0])).fetchone()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['networkx', 'sqlite3', 'contextlib', 'time', 'graph'],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
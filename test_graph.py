@@ -0,0 +1,333 @@
+"""CSC111 Project 2: FilmRecommandeur - Graph Tests
+
+This Python module contains the tests for the recommendation algorithms of the Graph structure,
+which check them against brute-force scoring of every movie.
+
+Copyright and Usage Information
+===============================
+This file (and other respective files associated with this project) is licensed
+under the MIT License. Please consult LICENSE for further details.
+
+Copyright (c) 2025 Minh Nguyen & Yifan Qiu
+"""
+from typing import Optional, Union
+import datetime
+
+from hypothesis import given, settings
+from hypothesis import strategies as st
+import pytest
+
+import database_import
+import graph as graph_module
+from graph import Graph, ReviewFilter
+from sqlite_graph import SQLiteGraph
+
+SCORE_TYPES = ['unweighted', 'weighted', 'advanced_weighted']
+
+
+def brute_force_recommendations(graph: Graph, movie: str, limit: int, score_type: str,
+                                restriction: int) -> list[tuple[float, str, str]]:
+    """Return the recommendations of Graph.recommend_movie for the given movie, computed by scoring
+    every other movie with Graph.get_similarity_score.
+    """
+    ratings = []
+    for other in graph.get_all_vertices('movie'):
+        if other != movie:
+            similarity_score = graph.get_similarity_score(movie, other, score_type, restriction)
+            if similarity_score > 0.0:
+                ratings.append((round(similarity_score * 1000, 2), other, movie))
+
+    ratings.sort(reverse=True)
+    return ratings[:limit]
+
+
+def build_graph(num_movies: int, reviews: list[tuple], graph: Optional[Union[Graph, SQLiteGraph]] = None) \
+        -> Union[Graph, SQLiteGraph]:
+    """Return a review graph with num_movies movies and the given reviews, each a tuple of
+    (movie number, reviewer number, score, sentiment score), optionally followed by the review date
+    and the publisher.
+
+    The reviews are added to graph if it is given, and to a new Graph otherwise.
+    """
+    if graph is None:
+        graph = Graph()
+    for i in range(num_movies):
+        graph.add_vertex(f'Movie {i}', 'movie')
+    for movie, reviewer, score, sentiment, *extra in reviews:
+        graph.add_vertex(f'Critic {reviewer}', 'user')
+        graph.add_edge(f'Movie {movie % num_movies}', f'Critic {reviewer}', [float(score), sentiment] + extra)
+    return graph
+
+
+@st.composite
+def review_graphs(draw: st.DrawFn) -> Graph:
+    """Return a random review graph.
+
+    The graphs are small, and the scores only take a few values, so that many movies have the same
+    similarity score.
+    """
+    num_movies = draw(st.integers(min_value=1, max_value=12))
+    reviews = draw(st.lists(st.tuples(st.integers(min_value=0, max_value=11),
+                                      st.integers(min_value=0, max_value=8),
+                                      st.integers(min_value=1, max_value=4),
+                                      st.sampled_from([-0.5, 0.0, 0.25, 0.5])),
+                            max_size=60))
+    return build_graph(num_movies, reviews)
+
+
+@given(review_graphs(), st.integers(min_value=0, max_value=11), st.integers(min_value=1, max_value=8),
+       st.sampled_from(SCORE_TYPES), st.integers(min_value=0, max_value=3))
+@settings(max_examples=300, deadline=None)
+def test_recommend_movie_top_matches_brute_force(graph: Graph, movie_number: int, limit: int,
+                                                 score_type: str, restriction: int) -> None:
+    """Test that recommend_movie_top returns exactly the brute-force recommendations, and accounts
+    for every other movie in its stats.
+    """
+    movies = sorted(graph.get_all_vertices('movie'))
+    movie = movies[movie_number % len(movies)]
+    stats = {}
+
+    actual = graph.recommend_movie_top(movie, limit, score_type, restriction, stats)
+
+    assert actual == brute_force_recommendations(graph, movie, limit, score_type, restriction)
+    assert stats['skipped'] + stats['pruned'] + stats['scored'] == len(movies) - 1
+    assert min(stats.values()) >= 0
+
+
+def test_recommend_movie_top_ties() -> None:
+    """Test that recommend_movie_top breaks ties between equal scores the same way as the brute force,
+    when the limit falls in the middle of the tied movies.
+    """
+    # Movies 1 to 6 each share one of the two reviewers of Movie 0, and have no other reviewer,
+    # so they all have the same similarity score, equal to their degree bound
+    lower_degree_reviews = [(0, 0, 3, 0.0), (0, 1, 3, 0.0)]
+    lower_degree_reviews += [(i, i % 2, 3, 0.0) for i in range(1, 7)]
+    # Movies 1 to 6 each share the only reviewer of Movie 0, and have one other reviewer
+    higher_degree_reviews = [(0, 0, 3, 0.0)]
+    higher_degree_reviews += [(i, reviewer, 3, 0.0) for i in range(1, 7) for reviewer in (0, i)]
+
+    for reviews in (lower_degree_reviews, higher_degree_reviews):
+        graph = build_graph(7, reviews)
+        for limit in range(1, 8):
+            for score_type in SCORE_TYPES:
+                expected = brute_force_recommendations(graph, 'Movie 0', limit, score_type, 0)
+                assert graph.recommend_movie_top('Movie 0', limit, score_type, 0) == expected
+
+
+def test_recommend_movie_top_skips_candidates() -> None:
+    """Test that recommend_movie_top stops before movies whose degree bound is below the best scores."""
+    # Movie 0 and Movie 1 have the same three reviewers, and Movie 2 has ten other reviewers
+    # besides one of theirs, so its bound (3 / 11) is below the top score (1)
+    reviews = [(movie, reviewer, 3, 0.0) for movie in (0, 1) for reviewer in range(3)]
+    reviews += [(2, reviewer, 3, 0.0) for reviewer in range(2, 13)]
+    graph = build_graph(3, reviews)
+    stats = {}
+
+    assert graph.recommend_movie_top('Movie 0', 1, 'unweighted', 0, stats) == [(1000.0, 'Movie 1', 'Movie 0')]
+    assert stats == {'skipped': 1, 'pruned': 0, 'scored': 1}
+
+
+@given(review_graphs(), st.integers(min_value=0, max_value=11), st.sampled_from([0, 1, 2.5, 3]))
+@settings(max_examples=200, deadline=None)
+def test_restriction_sweep_matches_similarity_score(graph: Graph, movie_number: int, restriction: float) -> None:
+    """Test that the restriction sweeps of a movie give the same similarity scores as get_similarity_score."""
+    movies = sorted(graph.get_all_vertices('movie'))
+    movie = movies[movie_number % len(movies)]
+
+    for score_type, advanced in (('weighted', False), ('advanced_weighted', True)):
+        sweep = graph.restriction_sweep(movie, advanced)
+        for other in movies:
+            if other != movie:
+                expected = graph.get_similarity_score(movie, other, score_type, restriction)
+                assert sweep.similarity_score(other, restriction) == pytest.approx(expected)
+
+
+@given(review_graphs(), st.integers(min_value=0, max_value=11), st.integers(min_value=1, max_value=8),
+       st.lists(st.integers(min_value=0, max_value=3), min_size=1, max_size=3))
+@settings(max_examples=200, deadline=None)
+def test_compare_recommendations_matches_brute_force(graph: Graph, movie_number: int, limit: int,
+                                                     restrictions: list[int]) -> None:
+    """Test that compare_recommendations returns the brute-force recommendations for every score type and
+    restriction.
+    """
+    movies = sorted(graph.get_all_vertices('movie'))
+    movie = movies[movie_number % len(movies)]
+
+    comparison = graph.compare_recommendations(movie, limit, restrictions)
+
+    assert set(comparison) == {(score_type, restriction) for score_type in SCORE_TYPES
+                               for restriction in restrictions}
+    for (score_type, restriction), actual in comparison.items():
+        assert actual == brute_force_recommendations(graph, movie, limit, score_type, restriction)
+
+
+@given(st.integers(min_value=1, max_value=12),
+       st.lists(st.tuples(st.integers(min_value=0, max_value=11), st.integers(min_value=0, max_value=8),
+                          st.integers(min_value=1, max_value=4), st.sampled_from([-0.5, 0.0, 0.5]),
+                          st.integers(min_value=0, max_value=6)),
+                max_size=60),
+       st.integers(min_value=0, max_value=11), st.integers(min_value=1, max_value=8),
+       st.sampled_from(SCORE_TYPES), st.integers(min_value=0, max_value=3),
+       st.integers(min_value=1, max_value=6), st.integers(min_value=0, max_value=5))
+@settings(max_examples=200, deadline=None)
+def test_recommend_movie_windowed_matches_brute_force(num_movies: int, reviews: list[tuple[int, int, int, float, int]],
+                                                      movie_number: int, limit: int, score_type: str,
+                                                      restriction: int, start: int, length: int) -> None:
+    """Test that recommend_movie with a window returns the brute-force recommendations of the graph
+    with only the reviews in the window.
+
+    Each review date is an offset from 1 January 2020, with undated reviews at offset 0.
+    """
+    first_day = datetime.date(2020, 1, 1)
+    dated_reviews = [(movie, reviewer, score, sentiment, first_day.toordinal() + day if day > 0 else 0)
+                     for movie, reviewer, score, sentiment, day in reviews]
+    graph = build_graph(num_movies, dated_reviews)
+    # A later review of the same movie by the same reviewer replaces the earlier one
+    latest_reviews = {(review[0] % num_movies, review[1]): review for review in dated_reviews}
+    window = (first_day + datetime.timedelta(days=start), first_day + datetime.timedelta(days=start + length))
+    window_reviews = [review for review in latest_reviews.values()
+                      if window[0].toordinal() <= review[4] <= window[1].toordinal()]
+    window_graph = build_graph(num_movies, window_reviews)
+    movie = f'Movie {movie_number % num_movies}'
+
+    actual = graph.recommend_movie(movie, limit, score_type, restriction, window=window)
+
+    assert actual == brute_force_recommendations(window_graph, movie, limit, score_type, restriction)
+
+
+@given(st.integers(min_value=1, max_value=12),
+       st.lists(st.tuples(st.integers(min_value=0, max_value=11), st.integers(min_value=0, max_value=8),
+                          st.integers(min_value=1, max_value=4), st.sampled_from([-0.5, 0.0, 0.5]),
+                          st.just(0), st.sampled_from(['Times', 'Post', 'Globe'])),
+                max_size=60),
+       st.integers(min_value=0, max_value=11), st.integers(min_value=1, max_value=8),
+       st.sampled_from(SCORE_TYPES), st.integers(min_value=0, max_value=3),
+       st.builds(ReviewFilter, st.sets(st.sampled_from(['Times', 'Post', 'Globe']), max_size=2),
+                 st.sets(st.sampled_from(['Times', 'Post', 'Globe']), max_size=1),
+                 st.sets(st.builds('Critic {}'.format, st.integers(min_value=0, max_value=8))),
+                 st.sets(st.builds('Critic {}'.format, st.integers(min_value=0, max_value=8)), max_size=2)))
+@settings(max_examples=200, deadline=None)
+def test_recommend_movie_filtered_matches_brute_force(num_movies: int, reviews: list[tuple],
+                                                      movie_number: int, limit: int, score_type: str,
+                                                      restriction: int, review_filter: ReviewFilter) -> None:
+    """Test that recommend_movie with a review filter returns the brute-force recommendations of the
+    graph with only the reviews allowed by the filter.
+    """
+    graph = build_graph(num_movies, reviews)
+    # A later review of the same movie by the same reviewer replaces the earlier one
+    latest_reviews = {(review[0] % num_movies, review[1]): review for review in reviews}
+    allowed_reviews = [review for review in latest_reviews.values()
+                       if review_filter.allows(f'Critic {review[1]}', review[5])]
+    filtered_graph = build_graph(num_movies, allowed_reviews)
+    movie = f'Movie {movie_number % num_movies}'
+
+    actual = graph.recommend_movie(movie, limit, score_type, restriction, review_filter=review_filter)
+
+    assert actual == brute_force_recommendations(filtered_graph, movie, limit, score_type, restriction)
+
+
+@given(st.integers(min_value=1, max_value=12),
+       st.lists(st.tuples(st.integers(min_value=0, max_value=11), st.integers(min_value=0, max_value=8),
+                          st.integers(min_value=1, max_value=4), st.sampled_from([-0.5, 0.0, 0.25, 0.5])),
+                max_size=60),
+       st.integers(min_value=0, max_value=11), st.integers(min_value=1, max_value=8),
+       st.sampled_from(SCORE_TYPES), st.integers(min_value=0, max_value=3))
+@settings(max_examples=100, deadline=None)
+def test_sqlite_graph_matches_graph(num_movies: int, reviews: list[tuple], movie_number: int, limit: int,
+                                    score_type: str, restriction: int) -> None:
+    """Test that an SQLiteGraph gives the same similarity scores and recommendations as a Graph with
+    the same reviews.
+    """
+    graph = build_graph(num_movies, reviews)
+    sqlite_graph = SQLiteGraph(':memory:')
+    with sqlite_graph.bulk_load():
+        build_graph(num_movies, reviews, sqlite_graph)
+    movie = f'Movie {movie_number % num_movies}'
+
+    for other in sorted(graph.get_all_vertices('movie')):
+        assert sqlite_graph.get_similarity_score(movie, other, score_type, restriction) \
+               == pytest.approx(graph.get_similarity_score(movie, other, score_type, restriction))
+    assert sqlite_graph.recommend_movie(movie, limit, score_type, restriction) \
+           == graph.recommend_movie(movie, limit, score_type, restriction)
+    assert sqlite_graph.recommend_movie_anytime(movie, limit, score_type, restriction).recommendations \
+           == graph.recommend_movie(movie, limit, score_type, restriction)
+    assert sqlite_graph.compare_recommendations(movie, limit, [0, restriction]) \
+           == graph.compare_recommendations(movie, limit, [0, restriction])
+    sqlite_graph.close()
+
+
+@given(review_graphs(), st.integers(min_value=0, max_value=11), st.integers(min_value=1, max_value=8),
+       st.sampled_from(SCORE_TYPES), st.lists(st.integers(min_value=0, max_value=3), min_size=1, max_size=4))
+@settings(max_examples=200, deadline=None)
+def test_recommend_movie_anytime_resumes(graph: Graph, movie_number: int, limit: int, score_type: str,
+                                         restrictions: list[int]) -> None:
+    """Test that repeating recommend_movie_anytime with no time budget resumes its scan until the
+    recommendations are exact, even when the restriction changes between calls.
+
+    The deadline is checked after every edge, so that each call visits a single edge.
+    """
+    movies = sorted(graph.get_all_vertices('movie'))
+    movie = movies[movie_number % len(movies)]
+    check_edges = graph_module.DEADLINE_CHECK_EDGES
+    graph_module.DEADLINE_CHECK_EDGES = 1
+    try:
+        coverage, calls = 0, 0
+        while True:
+            restriction = restrictions[calls % len(restrictions)]
+            result = graph.recommend_movie_anytime(movie, limit, score_type, restriction, 0)
+            assert result.coverage >= coverage
+            coverage, calls = result.coverage, calls + 1
+            if result.complete:
+                break
+            assert calls <= graph.count_edges() + 1
+    finally:
+        graph_module.DEADLINE_CHECK_EDGES = check_edges
+
+    assert result.recommendations == brute_force_recommendations(graph, movie, limit, score_type, restriction)
+    for restriction in restrictions:
+        result = graph.recommend_movie_anytime(movie, limit, score_type, restriction, 0)
+        assert result.complete
+        assert result.recommendations == brute_force_recommendations(graph, movie, limit, score_type, restriction)
+
+
+def test_recommend_movie_windowed_after_add_edge() -> None:
+    """Test that recommend_movie with a window accounts for edges added after an earlier windowed query."""
+    day = datetime.date(2020, 1, 1)
+    graph = build_graph(3, [(0, 0, 3, 0.0, day.toordinal()), (1, 0, 3, 0.0, day.toordinal()),
+                            (2, 1, 3, 0.0, day.toordinal())])
+    window = (day, day)
+    assert graph.recommend_movie('Movie 0', 2, window=window) == [(1000.0, 'Movie 1', 'Movie 0')]
+
+    graph.add_edge('Movie 2', 'Critic 0', [3.0, 0.0, day.toordinal()])
+
+    assert graph.recommend_movie('Movie 0', 2, window=window) == [(1000.0, 'Movie 1', 'Movie 0'),
+                                                                 (500.0, 'Movie 2', 'Movie 0')]
+
+
+
+def test_lazy_sentiment_rejects_rewritten_file(tmp_path) -> None:
+    """Test that lazily computed sentiment scores are read from an appended database file, but not from a
+    rewritten one, whose review offsets may point into different reviews.
+    """
+    database_file = str(tmp_path / 'reviews.csv')
+    header = ',movie_title,critic_name,publisher,review,date,score\n'
+    rows = ['0,Movie 0,Critic 0,Globe,good fun,2020-01-01,3\n', '1,Movie 1,Critic 0,Globe,bad plot,2020-01-01,3\n']
+    with open(database_file, 'w') as file:
+        file.write(header + ''.join(rows))
+    graph = database_import.load_review_graph(database_file, 'data/sentiment_scores.txt', lazy_sentiment=True)
+    expected = database_import.load_review_graph(database_file, 'data/sentiment_scores.txt')
+
+    with open(database_file, 'a') as file:
+        file.write('2,Movie 1,Critic 1,Globe,fun,2020-01-01,3\n')
+    assert graph.recommend_movie('Movie 0', 1, 'advanced_weighted', 1) == \
+        expected.recommend_movie('Movie 0', 1, 'advanced_weighted', 1)
+
+    graph = database_import.load_review_graph(database_file, 'data/sentiment_scores.txt', lazy_sentiment=True)
+    with open(database_file, 'w') as file:
+        file.write(header + ''.join(reversed(rows)))
+    with pytest.raises(ValueError):
+        graph.recommend_movie('Movie 0', 1, 'advanced_weighted', 1)
+
+
+if __name__ == "__main__":
+    pytest.main(['test_graph.py'])
@@ -11,7 +11,7 @@ Copyright (c) 2025 Minh Nguyen & Yifan Qiu
 """
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import (
-    QButtonGroup, QComboBox, QGridLayout, QMainWindow, QPushButton,
+    QButtonGroup, QCheckBox, QComboBox, QGridLayout, QMainWindow, QPushButton,
     QRadioButton, QScrollArea, QSlider, QWidget, QLabel, QGroupBox,
     QHBoxLayout, QVBoxLayout
 )
@@ -25,6 +25,10 @@ MINIMUM = 5
 MAXIMUM = 25
 LIMIT = 50
 
+# The time budget (in milliseconds) for computing all recommendations, shared between the selected movies,
+# unless exact results are asked for
+BUDGET_MS = 50
+
 
 class UserInterface(QMainWindow):
     """The main User Interface for the movie recommender.
@@ -132,6 +136,12 @@ class UserInterface(QMainWindow):
 
         settings_box_layout.addWidget(recommend_button)
 
+        # Compare button, showing the recommendations of every weighting side by side
+        compare_button = QPushButton('Compare weightings')
+        self._widgets['compare_button'] = compare_button
+        compare_button.clicked.connect(self.run_comparison_command)
+        settings_box_layout.addWidget(compare_button)
+
         # Set layout and return
         settings_box.setLayout(settings_box_layout)
         return settings_box
@@ -168,6 +178,10 @@ class UserInterface(QMainWindow):
         maximum_label = QLabel('Lenient')
         options_layout.addWidget(maximum_label, 3, 2, Qt.AlignRight)
 
+        # Exact results, without a time budget
+        self._widgets['exact_checkbox'] = QCheckBox('Exact results (slower)')
+        options_layout.addWidget(self._widgets['exact_checkbox'], 4, 0, Qt.AlignLeft)
+
         return options_box
 
     def build_output_widget(self) -> QGroupBox:
@@ -183,6 +197,11 @@ class UserInterface(QMainWindow):
         scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
         scroll_area.setWidgetResizable(True)
 
+        # Status of the last recommendations (e.g. whether they are partial)
+        status_label = QLabel('')
+        output_box_layout.addWidget(status_label)
+        self._widgets['status_label'] = status_label
+
         # Setup output content
         content_widget = QWidget()
         content_layout = QVBoxLayout(content_widget)
@@ -219,17 +238,8 @@ class UserInterface(QMainWindow):
         """
         # Setup
         content_layout = self._widgets['content_layout']
-        user_movies = []
+        user_movies = self.get_selected_movies()
         temp_recommendations = []
-        recommendations = []
-
-        # Get movies
-        for i in range(1, 5):
-            normalized_name = 'movie_selection_option_' + str(i)
-            item = self._widgets[normalized_name].currentText()
-
-            if item not in {'', 'Unselected'}:
-                user_movies.append(item)
 
         # Get options
         weight_mode = 'unweighted'
@@ -240,28 +250,27 @@ class UserInterface(QMainWindow):
 
         restriction = self._widgets['restriction_slider'].value()
 
-        # Get recommendations
+        # Get recommendations, splitting the time budget between the selected movies
+        coverages = []
         for movie in user_movies:
-            lst = self.graph.recommend_movie(movie, LIMIT, weight_mode, restriction)
-            temp_recommendations += lst
+            budget_ms = None if self._widgets['exact_checkbox'].isChecked() else BUDGET_MS / len(user_movies)
+            result = self.graph.recommend_movie_anytime(movie, LIMIT, weight_mode, restriction, budget_ms)
+            temp_recommendations += result.recommendations
+            coverages.append(result.coverage)
+
+        if all(coverage == 1 for coverage in coverages):
+            self._widgets['status_label'].setText('')
+        else:
+            # Each query resumes where the last one stopped, so the results improve with every click
+            coverage = sum(coverages) / len(coverages)
+            self._widgets['status_label'].setText(f'Partial results ({coverage:.0%} of the reviews considered), '
+                                                  'click again to refine them')
 
         # Filter unnecessaries
-        temp_recommendations.sort(reverse=True)
-
-        for recommend in temp_recommendations:
-            if recommend[1] in user_movies or recommend[1] in [rec[1] for rec in recommendations]:
-                continue
-
-            if len(recommendations) >= LIMIT:
-                break
-
-            recommendations.append(recommend)
+        recommendations = merge_recommendations(temp_recommendations, user_movies)
 
         # Remove previous elements
-        for widget in self._output_widgets:
-            content_layout.removeWidget(widget)
-
-        self._output_widgets = set()
+        self.clear_output()
 
         # Build widget
         for i in range(1, min(LIMIT, len(recommendations))):
@@ -274,6 +283,76 @@ class UserInterface(QMainWindow):
         self.is_running = False
         self._widgets['recommend_button'].setText('Recommend me movies!')
 
+    def build_comparison(self) -> None:
+        """The method to build and display the results of every weighting side by side
+        """
+        # Setup
+        content_layout = self._widgets['content_layout']
+        user_movies = self.get_selected_movies()
+        restriction = self._widgets['restriction_slider'].value()
+        weighting_options = {'unweighted': 'Unweighted', 'weighted': 'Weighted',
+                             'advanced_weighted': 'Advanced Weighted'}
+        temp_recommendations = {weight_mode: [] for weight_mode in weighting_options}
+
+        # Get the recommendations of every weighting, with one traversal per movie
+        for movie in user_movies:
+            comparison = self.graph.compare_recommendations(movie, LIMIT, [restriction])
+            for weight_mode in weighting_options:
+                temp_recommendations[weight_mode] += comparison[(weight_mode, restriction)]
+
+        self._widgets['status_label'].setText('')
+        self.clear_output()
+
+        # Build one column per weighting
+        comparison_box = QGroupBox()
+        comparison_layout = QHBoxLayout()
+        for weight_mode, weight_name in weighting_options.items():
+            column = QGroupBox(weight_name)
+            column_layout = QVBoxLayout()
+            recommendations = merge_recommendations(temp_recommendations[weight_mode], user_movies)
+            for i in range(len(recommendations)):
+                column_layout.addWidget(self.build_result(i + 1, recommendations[i][1],
+                                                          recommendations[i][0], recommendations[i][2]))
+            column.setLayout(column_layout)
+            comparison_layout.addWidget(column, 0, Qt.AlignTop)
+
+        comparison_box.setLayout(comparison_layout)
+        self._output_widgets.add(comparison_box)
+        content_layout.addWidget(comparison_box)
+
+        # End command
+        self.is_running = False
+        self._widgets['compare_button'].setText('Compare weightings')
+
+    def get_selected_movies(self) -> list[str]:
+        """Return the movies currently selected by the user
+        """
+        user_movies = []
+        for i in range(1, 5):
+            normalized_name = 'movie_selection_option_' + str(i)
+            item = self._widgets[normalized_name].currentText()
+
+            if item not in {'', 'Unselected'}:
+                user_movies.append(item)
+        return user_movies
+
+    def clear_output(self) -> None:
+        """Remove the previously displayed results
+        """
+        content_layout = self._widgets['content_layout']
+        for widget in self._output_widgets:
+            content_layout.removeWidget(widget)
+
+        self._output_widgets = set()
+
+    def run_comparison_command(self) -> None:
+        """Method which detects the signal upon the compare button get pressed.
+        """
+        if not self.is_running:
+            self.is_running = True
+            self._widgets['compare_button'].setText('Running...')
+            self.build_comparison()
+
     def run_recommendation_command(self) -> None:
         """Method which detects the signal upon the recommend button get pressed.
         """
@@ -283,6 +362,24 @@ class UserInterface(QMainWindow):
             self.build_recommendations()
 
 
+def merge_recommendations(temp_recommendations: list[tuple[float, str, str]],
+                          user_movies: list[str]) -> list[tuple[float, str, str]]:
+    """Return up to LIMIT of the best given recommendations, without the user's movies or duplicate movies
+    """
+    recommendations = []
+    temp_recommendations.sort(reverse=True)
+
+    for recommend in temp_recommendations:
+        if recommend[1] in user_movies or recommend[1] in [rec[1] for rec in recommendations]:
+            continue
+
+        if len(recommendations) >= LIMIT:
+            break
+
+        recommendations.append(recommend)
+    return recommendations
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()